@@ -0,0 +1,211 @@
+"""
+Play engine against engine to check that a change to the search does not cost strength.
+
+Two configurations, A and B, play a match of games from random knight placements.
+Every placement is played twice with the colors swapped, so neither side profits from
+a lucky setup. A player moves the way the computer does in ComputerVsPlayer: it blocks
+an approaching man with a box when it has none on the board, otherwise it plays the
+move iterative_deepening finds. The game clock stands still during a match; a game
+that reaches --plies, or where the player to move is stuck, is decided as check_winner
+decides one whose clock ran out.
+
+A configuration is a comma separated list of settings:
+
+    depth       most plies iterative_deepening searches
+    time        seconds per move
+    quiescence  engine.QUIESCENCE_DEPTH, 0 turns the quiescence search off
+    aspiration  engine.ASPIRATION_WINDOW, 0 searches full windows
+    danger, knight_target, capture
+                engine.DANGER_WEIGHT, KNIGHT_TARGET_WEIGHT and CAPTURE_WEIGHT
+    book, tablebase
+                an OpeningBook or Tablebase file, none by default
+
+    python arena.py --games 100 --a depth=6 --b depth=6,aspiration=0
+    python arena.py --games 40 --a time=0.5 --b time=0.5,danger=5 --workers 4
+
+The result is given for A: wins, draws and losses, the Elo difference with its 95%
+confidence interval, and each configuration's average time per move.
+"""
+import argparse
+import math
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import engine
+from engine import Board, OpeningBook, TranspositionTable, RED, BLUE, GAME_TIME, iterative_deepening, tablebase_at
+from perft import setup_placements
+
+# Engine module settings a configuration can change, by configuration name
+ENGINE_SETTINGS = {
+    'quiescence': 'QUIESCENCE_DEPTH',
+    'aspiration': 'ASPIRATION_WINDOW',
+    'danger': 'DANGER_WEIGHT',
+    'knight_target': 'KNIGHT_TARGET_WEIGHT',
+    'capture': 'CAPTURE_WEIGHT',
+}
+
+
+def parse_config(text):
+    """
+    A configuration as a dict, from its comma separated name=value settings.
+    """
+    config = {'depth': engine.AI_MAX_DEPTH, 'time': 1.0, 'book': None, 'tablebase': None}
+    config.update((name, getattr(engine, setting)) for name, setting in ENGINE_SETTINGS.items())
+    for item in filter(None, text.split(',')):
+        name, _, value = item.partition('=')
+        name = name.strip()
+        if name not in config:
+            raise argparse.ArgumentTypeError(f"unknown setting {name!r}")
+        if name in ('book', 'tablebase'):
+            config[name] = value
+        elif name == 'time':
+            config[name] = float(value)
+        else:
+            config[name] = int(value)
+    return config
+
+
+class Player:
+    """
+    One configuration playing one game, with its own transposition table.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.tt = TranspositionTable()
+        self.book = OpeningBook(config['book']) if config['book'] else None
+        self.tablebase = tablebase_at(config['tablebase']) if config['tablebase'] else None
+        self.moves = 0
+        self.time = 0.0
+
+    def choose(self, board):
+        """
+        The move to play, as make_move takes it, or None if there is none.
+        """
+        boxes = board.red_boxes if board.turn == RED else board.blue_boxes
+        if not boxes:
+            box_position = board.should_place_box()
+            if box_position:
+                return None, box_position, []
+
+        # The engine settings are module globals, shared by both players of a worker
+        for name, setting in ENGINE_SETTINGS.items():
+            setattr(engine, setting, self.config[name])
+        start = time.perf_counter()
+        _, move, _ = iterative_deepening(board, self.config['time'], self.config['depth'], self.tt,
+                                         book=self.book, tablebase=self.tablebase)
+        self.time += time.perf_counter() - start
+        self.moves += 1
+        return move
+
+    def close(self):
+        if self.book is not None:
+            self.book.close()
+
+
+def play_game(config_a, config_b, a_color, seed, max_plies):
+    """
+    Play one game and return (result for A, A's (moves, seconds), B's (moves, seconds), plies).
+    The result is 1 for a win, 0.5 for a draw and 0 for a loss.
+    """
+    rng = random.Random(seed)
+    board = Board()
+    board.select(*rng.choice(setup_placements(board)))  # Red places Blue's knight
+    board.select(*rng.choice(setup_placements(board)))  # Blue places Red's knight
+
+    player_a, player_b = Player(config_a), Player(config_b)
+    players = {a_color: player_a, (BLUE if a_color == RED else RED): player_b}
+    plies = 0
+    while plies < max_plies:
+        board.start_time = time.time()
+        if board.check_winner():
+            break
+        move = players[board.turn].choose(board)
+        if move is None:
+            break
+        board.make_move(move)
+        plies += 1
+
+    if not board.winner:
+        board.start_time = time.time() - GAME_TIME - 1  # Decide it as if the clock ran out
+        board.check_winner()
+    player_a.close()
+    player_b.close()
+
+    if board.winner == "Tie":
+        result = 0.5
+    else:
+        result = 1.0 if board.winner == ("Red" if a_color == RED else "Blue") else 0.0
+    return result, (player_a.moves, player_a.time), (player_b.moves, player_b.time), plies
+
+
+def elo(score):
+    """
+    Elo difference that a score fraction between 0 and 1 stands for.
+    """
+    if score <= 0:
+        return float('-inf')
+    if score >= 1:
+        return float('inf')
+    return 400 * math.log10(score / (1 - score))
+
+
+def elo_interval(results, z=1.96):
+    """
+    (Elo, lower, upper) of a list of game results, with a normal confidence interval on the score.
+    """
+    games = len(results)
+    score = sum(results) / games
+    deviation = math.sqrt(sum((result - score) ** 2 for result in results) / games)
+    margin = z * deviation / math.sqrt(games)
+    return elo(score), elo(score - margin), elo(score + margin)
+
+
+def report(results, moves_a, moves_b):
+    wins, draws = results.count(1.0), results.count(0.5)
+    losses = len(results) - wins - draws
+    rating, lower, upper = elo_interval(results)
+    print(f"A: {wins} wins, {draws} draws, {losses} losses in {len(results)} games, "
+          f"score {sum(results) / len(results):.1%}")
+    print(f"Elo A - B: {rating:+.0f} (95% {lower:+.0f} to {upper:+.0f})")
+    for name, (moves, seconds) in (('A', moves_a), ('B', moves_b)):
+        print(f"{name}: {moves} moves searched, {seconds / moves if moves else 0:.3f}s per move")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play a match between two engine configurations.")
+    parser.add_argument('--a', type=parse_config, default=parse_config(''), help="configuration A, e.g. depth=6")
+    parser.add_argument('--b', type=parse_config, default=parse_config(''), help="configuration B, e.g. time=0.5")
+    parser.add_argument('--games', type=int, default=20, help="games to play, rounded up to an even number")
+    parser.add_argument('--plies', type=int, default=400, help="plies after which a game is decided on points")
+    parser.add_argument('--seed', type=int, default=1, help="seed of the random knight placements")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="games played at the same time")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    seeds = [rng.getrandbits(32) for _ in range((args.games + 1) // 2)]
+    results = []
+    moves_a, moves_b = [0, 0.0], [0, 0.0]
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {executor.submit(play_game, args.a, args.b, color, seed, args.plies): (number, color)
+                   for number, seed in enumerate(seeds, 1) for color in (RED, BLUE)}
+        for future in as_completed(futures):
+            number, color = futures[future]
+            result, (a_moves, a_time), (b_moves, b_time), plies = future.result()
+            results.append(result)
+            moves_a[0] += a_moves
+            moves_a[1] += a_time
+            moves_b[0] += b_moves
+            moves_b[1] += b_time
+            outcome = {1.0: "A wins", 0.5: "draw", 0.0: "B wins"}[result]
+            print(f"game {number} (A {'red' if color == RED else 'blue'}): {outcome} in {plies} plies, "
+                  f"{time.perf_counter() - start:.0f}s")
+
+    report(results, moves_a, moves_b)
+
+
+if __name__ == "__main__":
+    main()
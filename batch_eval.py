@@ -0,0 +1,149 @@
+"""
+evaluate() for many positions at once with NumPy.
+
+A batch is an int8 array of shape (N, 5, ROWS, COLS) holding one plane per PLANES entry.
+The red and blue planes mark every piece of that side, knight included; the king and
+knight planes mark which of those pieces are kings and knights. The same shifted-mask
+terms as engine._side_score are computed for all N positions in one pass, so a whole
+search frontier or a self-play dataset is scored without a Python loop per position.
+Internally each plane row is packed into one 12-bit word, so a column shift is a bit
+shift and a row shift is a slice along the rows.
+
+NumPy is only needed by this module, the engine and the games do not use it.
+"""
+import numpy as np
+
+import engine
+from engine import ROWS, COLS, KNIGHT_DIRECTIONS, DIAGONAL_DIRECTIONS
+
+PLANES = ('red', 'blue', 'king', 'knight', 'box')
+RED_PLANE, BLUE_PLANE, KING_PLANE, KNIGHT_PLANE, BOX_PLANE = range(len(PLANES))
+MASK_BYTES = (ROWS * COLS + 7) // 8
+ROW_BITS = (1 << COLS) - 1
+COL_BITS = (1 << np.arange(COLS)).astype(np.uint16)
+# Set squares in every 12-bit row word, for counting without a loop over columns
+ROW_COUNTS = np.array([bin(word).count('1') for word in range(1 << COLS)], dtype=np.int64)
+
+
+def board_planes(board):
+    """
+    The (5, ROWS, COLS) int8 planes of a Board.
+    """
+    planes, _ = stack_boards([board])
+    return planes[0]
+
+
+# Every bitboard of every board as little-endian bytes, MASK_BYTES per plane
+def _mask_bytes(boards):
+    data = b''.join(mask.to_bytes(MASK_BYTES, 'little') for board in boards for mask in (
+        board.red_mask, board.blue_mask, board.king_mask, board.knight_mask, board.red_box_mask | board.blue_box_mask))
+    return np.frombuffer(data, dtype=np.uint8).reshape(len(boards), len(PLANES), MASK_BYTES)
+
+
+def _points(boards):
+    return np.array([board.blue_points - board.red_points for board in boards], dtype=np.int64)
+
+
+def stack_boards(boards):
+    """
+    Planes of every board stacked into an (N, 5, ROWS, COLS) batch, and the
+    (N,) blue minus red points that evaluate adds on top of the planes.
+    """
+    bits = np.unpackbits(_mask_bytes(boards), axis=-1, bitorder='little')
+    planes = bits[..., :ROWS * COLS].reshape(len(boards), len(PLANES), ROWS, COLS).astype(np.int8)
+    return planes, _points(boards)
+
+
+def _row_words(planes):
+    """
+    Pack (..., ROWS, COLS) squares into (..., ROWS) uint16 words, bit col of a word is that column.
+    """
+    return ((planes != 0).astype(np.uint16) @ COL_BITS).astype(np.uint16)
+
+
+def _board_row_words(boards):
+    """
+    The row words of every board straight from its bitboards, without building the planes.
+    A 12-square row is a byte and a half, so every three bytes hold two rows.
+    """
+    triples = _mask_bytes(boards).reshape(len(boards), len(PLANES), ROWS // 2, 3).astype(np.uint16)
+    even = triples[..., 0] | ((triples[..., 1] & 0xF) << 8)
+    odd = (triples[..., 1] >> 4) | (triples[..., 2] << 4)
+    return np.stack([even, odd], axis=-1).reshape(len(boards), len(PLANES), ROWS)
+
+
+def _shift(words, dr, dc):
+    """
+    Move every square of (N, ROWS) row words by (dr, dc), dropping squares that leave the board.
+    """
+    if dc > 0:
+        words = (words << dc) & ROW_BITS
+    elif dc < 0:
+        words = words >> -dc
+    if dr == 0:
+        return words
+    shifted = np.zeros_like(words)
+    if dr > 0:
+        shifted[:, dr:] = words[:, :ROWS - dr]
+    elif dr > -ROWS:
+        shifted[:, :ROWS + dr] = words[:, -dr:]
+    return shifted
+
+
+def _knight_attacks(words):
+    attacks = np.zeros_like(words)
+    for dr, dc in KNIGHT_DIRECTIONS:
+        attacks |= _shift(words, dr, dc)
+    return attacks
+
+
+def _count(words):
+    return ROW_COUNTS[words].sum(axis=1)
+
+
+def _side_scores(men, kings, opponents, opponent_men, opponent_knights, others, empty, forward):
+    threatened = _knight_attacks(opponent_knights)
+    for dr, dc in DIAGONAL_DIRECTIONS:
+        threatened |= _shift(opponents, -dr, -dc) & (
+            _shift(empty, -2 * dr, -2 * dc) | (_shift(opponent_men, -dr, -dc) & _shift(opponents, -2 * dr, -2 * dc)))
+
+    scores = _count(men)
+    scores -= engine.DANGER_WEIGHT * _count(men & threatened)  # Higher penalty for pieces in danger
+    # Reward if a knight jump could capture
+    scores += engine.KNIGHT_TARGET_WEIGHT * _count(men & _knight_attacks(others))
+
+    # Reward for capture moves: every link of a jump chain along the column is one move
+    for step, chain in ((forward, men), (-forward, kings)):
+        distance = 1
+        while chain.any():
+            chain = chain & _shift(others, -step * distance, 0) & _shift(empty, -step * (distance + 1), 0)
+            scores += engine.CAPTURE_WEIGHT * _count(chain)
+            distance += 2
+    return scores
+
+
+def evaluate_batch(planes, points=None):
+    """
+    evaluate() of every position in an (N, 5, ROWS, COLS) batch, as an (N,) int64 array.
+    points is the (N,) blue minus red points of each position, zero if left out.
+    """
+    return _evaluate_words(_row_words(np.asarray(planes)), points)
+
+
+def _evaluate_words(words, points=None):
+    red, blue = words[:, RED_PLANE], words[:, BLUE_PLANE]
+    kings, knights = words[:, KING_PLANE], words[:, KNIGHT_PLANE]
+    red_men, blue_men = red & ~knights, blue & ~knights
+    empty = ~(red | blue | words[:, BOX_PLANE]) & ROW_BITS
+
+    scores = np.zeros(len(words), dtype=np.int64) if points is None else np.array(points, dtype=np.int64)
+    scores += _side_scores(blue_men, blue_men & kings, red, red_men, red & knights, red | (blue & knights), empty, -1)
+    scores -= _side_scores(red_men, red_men & kings, blue, blue_men, blue & knights, blue | (red & knights), empty, 1)
+    return scores
+
+
+def evaluate_boards(boards):
+    """
+    evaluate() of every Board in a list, in one vectorized pass.
+    """
+    return _evaluate_words(_board_row_words(boards), _points(boards))
@@ -0,0 +1,92 @@
+"""
+Build the opening book the computer player consults before searching.
+
+Games are played by the engine against itself from random knight placements. Red's
+knight is placed the way ComputerVsPlayer places it, so the book covers the positions
+the computer meets in real games. Every position in the first plies of a game is
+searched to a fixed depth and its best move stored. A move is then played, picked at
+random now and then so the games spread out.
+
+    python book.py --games 40 --plies 8 --depth 6
+    python book.py --games 20 --extend
+
+The book is written to engine.AI_BOOK unless --output says otherwise; --extend keeps
+the positions of the existing book and only searches positions that are new or were
+searched less deep.
+"""
+import argparse
+import os
+import random
+import time
+
+from engine import Board, OpeningBook, TranspositionTable, AI_BOOK, iterative_deepening, move_key
+from perft import setup_placements
+
+
+def play_game(entries, plies, depth, randomness, rng):
+    """
+    Play one self-play game, adding the searched positions to entries.
+    Returns the number of positions searched.
+    """
+    board = Board()
+    board.select(*rng.choice(setup_placements(board)))  # Red places Blue's knight
+    board.computer_place_enemy_knight()
+
+    tt = TranspositionTable()
+    searched = 0
+    for _ in range(plies):
+        board.start_time = time.time()  # The game clock stands still while the book is built
+        if board.check_winner():
+            break
+        moves = board.get_all_valid_moves(board.turn)
+        if not moves:
+            break
+
+        entry = entries.get(board.hash)
+        if entry is None or entry[2] < depth:
+            score, move, _ = iterative_deepening(board, float('inf'), depth, tt)
+            if move is None:
+                break
+            entries[board.hash] = (*move_key(move), depth, score)
+            searched += 1
+
+        from_sq, to_sq = entries[board.hash][:2]
+        if rng.random() < randomness:
+            move = rng.choice(moves)
+        else:
+            move = next(move for move in moves if move_key(move) == (from_sq, to_sq))
+        board.make_move(move)
+    return searched
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the opening book from engine self-play.")
+    parser.add_argument('--games', type=int, default=40, help="self-play games to play")
+    parser.add_argument('--plies', type=int, default=8, help="plies of every game to search and store")
+    parser.add_argument('--depth', type=int, default=6, help="search depth of every stored position")
+    parser.add_argument('--random', type=float, default=0.3,
+                        help="chance of playing a random move instead of the book move")
+    parser.add_argument('--seed', type=int, default=1, help="seed of the random knight placements and moves")
+    parser.add_argument('--output', default=AI_BOOK, help="book file to write")
+    parser.add_argument('--extend', action='store_true', help="keep the positions of the existing book")
+    args = parser.parse_args()
+
+    entries = {}
+    if args.extend and os.path.exists(args.output):
+        book = OpeningBook(args.output)
+        entries.update(book.items())
+        book.close()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    for game in range(1, args.games + 1):
+        searched = play_game(entries, args.plies, args.depth, args.random, rng)
+        print(f"game {game}: {searched} positions searched, {len(entries)} in the book, "
+              f"{time.perf_counter() - start:.0f}s")
+
+    OpeningBook.write(args.output, entries)
+    print(f"wrote {len(entries)} positions to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
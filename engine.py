@@ -0,0 +1,2032 @@
+"""
+Rules and computer player for 12x12 checkers with knights and boxes.
+Nothing here imports pygame, so the engine runs in tests, servers and worker processes;
+gui.py draws a Board and the game scripts are thin front ends over both.
+"""
+import time
+import copy
+import json
+import math
+import mmap
+import random
+import struct
+import threading
+import os
+import multiprocessing
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor, wait
+
+ROWS, COLS = 12, 12
+GAME_TIME = 300  # Seconds on the game clock
+
+# Computer player settings
+AI_TIME_BUDGET = None  # Seconds per move, or None to share out the remaining game clock
+AI_MAX_DEPTH = 20
+AI_WORKERS = os.cpu_count() or 1  # Processes searching the computer move, 1 searches in this process only
+AI_PARALLEL_MODE = "lazy_smp"  # "lazy_smp" shares one table between the processes, "root" splits the root moves
+AI_STATS_LOG = None  # JSON lines file every computer move's SearchStats are appended to, or None
+AI_BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "opening_book.bin")  # Built by book.py
+AI_TABLEBASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "endgame.tb")  # Built by tablebase.py
+
+# Player colors; a knight carries its side's SPECIAL color
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+SPECIAL_RED = (255, 105, 180)  # Pink for red player knight
+SPECIAL_BLUE = (135, 206, 250)  # Light blue for blue player knight
+
+# Bitboards: square (row, col) is bit row * COLS + col of a 144-bit integer
+ALL_SQUARES = (1 << (ROWS * COLS)) - 1
+COL_MASKS = [sum(1 << (row * COLS + col) for row in range(ROWS)) for col in range(COLS)]
+ROW_MASKS = [((1 << COLS) - 1) << (row * COLS) for row in range(ROWS)]
+KNIGHT_DIRECTIONS = [
+    (2, 1), (1, 2), (-1, 2), (-2, 1),
+    (-2, -1), (-1, -2), (1, -2), (2, -1)
+]
+DIAGONAL_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+# Squares that stay on the board when shifted dc columns sideways
+SHIFT_GUARDS = {
+    dc: ALL_SQUARES & ~sum(COL_MASKS[col] for col in range(COLS) if not 0 <= col + dc < COLS)
+    for dc in range(-COLS + 1, COLS)
+}
+# The guards evaluate and knight_attacks use, bound to names so the shifts can be written inline
+RIGHT_1, LEFT_1, RIGHT_2, LEFT_2 = SHIFT_GUARDS[1], SHIFT_GUARDS[-1], SHIFT_GUARDS[2], SHIFT_GUARDS[-2]
+
+# Zobrist keys, drawn from a fixed seed so a position hashes the same in every run
+_zobrist_random = random.Random(0x12C4EC)
+PIECE_KEYS = [[_zobrist_random.getrandbits(64) for _ in range(ROWS * COLS)] for _ in range(6)]
+BOX_KEYS = [[[_zobrist_random.getrandbits(64) for _ in range(ROWS * COLS)] for _ in range(7)] for _ in range(2)]
+TURN_KEY = _zobrist_random.getrandbits(64)
+COUNT_LIMIT = 64
+# Entry 0 is zero so an untouched counter adds nothing to the hash
+POINTS_KEYS = [[0] + [_zobrist_random.getrandbits(64) for _ in range(COUNT_LIMIT - 1)] for _ in range(2)]
+CAPTURES_KEYS = [[0] + [_zobrist_random.getrandbits(64) for _ in range(COUNT_LIMIT - 1)] for _ in range(2)]
+
+
+def square(row, col):
+    return row * COLS + col
+
+
+def squares(mask):
+    """
+    Yield the square index of every set bit in mask, lowest square first.
+    """
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def shift(mask, dr, dc):
+    """
+    Shift every square in mask by (dr, dc), dropping squares that leave the board.
+    """
+    mask &= SHIFT_GUARDS[dc]
+    offset = dr * COLS + dc
+    if offset >= 0:
+        return (mask << offset) & ALL_SQUARES
+    return mask >> -offset
+
+
+def knight_attacks(mask):
+    # One column sideways then two rows, or two columns sideways then one row
+    one_col = ((mask & RIGHT_1) << 1) | ((mask & LEFT_1) >> 1)
+    two_cols = ((mask & RIGHT_2) << 2) | ((mask & LEFT_2) >> 2)
+    return ((one_col << 2 * COLS) | (one_col >> 2 * COLS) | (two_cols << COLS) | (two_cols >> COLS)) & ALL_SQUARES
+
+
+# Per-square tables, built once so the hot paths neither loop over directions nor check bounds
+KNIGHT_TARGETS = [knight_attacks(1 << sq) for sq in range(ROWS * COLS)]
+# (neighbour, square behind it) bits for every diagonal that has a neighbour, behind is 0 off the board
+DIAGONAL_STEPS = [
+    tuple((shift(1 << sq, dr, dc), shift(1 << sq, 2 * dr, 2 * dc))
+          for dr, dc in DIAGONAL_DIRECTIONS if shift(1 << sq, dr, dc))
+    for sq in range(ROWS * COLS)
+]
+# (row, bit, square) of the next two squares of the column from a square, for steps of -1 and 1 rows
+COLUMN_STEPS = {
+    step: [tuple((row, 1 << square(row, col), square(row, col))
+                 for row in range(start, min(max(start + 2 * step, -1), ROWS), step))
+           for start in range(ROWS) for col in range(COLS)]
+    for step in (-1, 1)
+}
+
+
+def side_of(color):
+    return RED if color == RED or color == SPECIAL_RED else BLUE
+
+
+# Index of the piece in PIECE_KEYS: red man/king/knight, then blue man/king/knight
+def piece_kind(piece):
+    kind = 0 if side_of(piece.color) == RED else 3
+    if piece.knight:
+        return kind + 2
+    if piece.king:
+        return kind + 1
+    return kind
+
+
+def count_key(keys, count):
+    return keys[min(count, COUNT_LIMIT - 1)]
+
+
+class Piece:
+    def __init__(self, row, col, color, is_king=False, is_knight=False):
+        self.row = row
+        self.col = col
+        self.color = color
+        self.king = is_king
+        self.knight = is_knight
+
+    # Move the piece to a new position
+    def move(self, row, col):
+        self.row = row
+        self.col = col
+
+
+class Board:
+    def __init__(self):
+        self.pieces = [None] * (ROWS * COLS)
+        self.red_mask = 0
+        self.blue_mask = 0
+        self.king_mask = 0
+        self.knight_mask = 0
+        self.red_box_mask = 0
+        self.blue_box_mask = 0
+        self.hash = 0  # Zobrist hash, kept up to date by every change to the position
+        self.selected_piece = None
+        self.turn = RED
+        self.valid_moves = {}
+        self.red_captures = 0
+        self.blue_captures = 0
+        self.red_points = 0
+        self.blue_points = 0
+        self.red_knight_set = False
+        self.blue_knight_set = False
+        self.setup_phase = True
+        self.winner = None
+        self.red_boxes = []
+        self.blue_boxes = []
+        self.placing_box = False
+        self.create_board()
+        self.start_time = time.time()  # Start the timer
+
+    # Create the initial board setup
+    def create_board(self):
+        for row in range(ROWS):
+            for col in range(COLS):
+                if row % 2 == ((col + 1) % 2):
+                    if row < 4:
+                        self._place(Piece(row, col, RED), row, col)
+                    elif row > 7:
+                        self._place(Piece(row, col, BLUE), row, col)
+
+        # Knight pieces will be placed during the setup phase
+        self.red_knight = Piece(-1, -1, SPECIAL_RED, is_knight=True)
+        self.blue_knight = Piece(-1, -1, SPECIAL_BLUE, is_knight=True)
+
+    # Put a piece on an empty square and set its bits
+    def _place(self, piece, row, col):
+        sq = square(row, col)
+        bit = 1 << sq
+        self.pieces[sq] = piece
+        self.hash ^= PIECE_KEYS[piece_kind(piece)][sq]
+        if side_of(piece.color) == RED:
+            self.red_mask |= bit
+        else:
+            self.blue_mask |= bit
+        if piece.king:
+            self.king_mask |= bit
+        if piece.knight:
+            self.knight_mask |= bit
+        piece.move(row, col)
+
+    # Take whatever piece stands on the square off the bitboards
+    def _lift(self, row, col):
+        if row < 0:
+            return  # Already off the board
+        sq = square(row, col)
+        clear = ~(1 << sq)
+        if self.pieces[sq]:
+            self.hash ^= PIECE_KEYS[piece_kind(self.pieces[sq])][sq]
+        self.pieces[sq] = None
+        self.red_mask &= clear
+        self.blue_mask &= clear
+        self.king_mask &= clear
+        self.knight_mask &= clear
+
+    # Mask of the squares holding pieces of exactly this color (knights carry the SPECIAL colors)
+    def color_mask(self, color):
+        if color == RED:
+            return self.red_mask & ~self.knight_mask
+        if color == BLUE:
+            return self.blue_mask & ~self.knight_mask
+        if color == SPECIAL_RED:
+            return self.red_mask & self.knight_mask
+        return self.blue_mask & self.knight_mask
+
+    # Mask of every piece on the given side, knight included
+    def side_mask(self, color):
+        return self.red_mask if side_of(color) == RED else self.blue_mask
+
+    def box_mask(self):
+        return self.red_box_mask | self.blue_box_mask
+
+    def occupied_mask(self):
+        return self.red_mask | self.blue_mask | self.red_box_mask | self.blue_box_mask
+
+    def is_empty(self, row, col):
+        return not (self.occupied_mask() >> square(row, col)) & 1
+
+    # Move a piece to a new location on the board
+    def move(self, piece, row, col):
+        self._lift(piece.row, piece.col)  # Clear the old position
+        if (piece.color == RED and row == ROWS - 1) or (piece.color == BLUE and row == 0):
+            if piece.color == RED:
+                self.hash ^= count_key(POINTS_KEYS[0], self.red_points)
+                self.red_points += 1
+                self.hash ^= count_key(POINTS_KEYS[0], self.red_points)
+            else:
+                self.hash ^= count_key(POINTS_KEYS[1], self.blue_points)
+                self.blue_points += 1
+                self.hash ^= count_key(POINTS_KEYS[1], self.blue_points)
+            piece.move(-1, -1)  # Move piece off the board
+            self.check_winner()
+        else:
+            self._place(piece, row, col)  # Move the piece to the new position
+
+    # Get the piece at the specified location (0 for an empty square, 1 for a box)
+    def get_piece(self, row, col):
+        sq = square(row, col)
+        if self.pieces[sq]:
+            return self.pieces[sq]
+        return 1 if (self.box_mask() >> sq) & 1 else 0
+
+    def select(self, row, col):
+        if self.winner:
+            return
+
+        # During setup phase
+        if self.setup_phase:
+            if self.turn == RED and not self.blue_knight_set:
+                # Red places the blue knight in rows 9-11 (blue starting area)
+                if row >= ROWS - 3 and self.is_empty(row, col):
+                    self._place(self.blue_knight, row, col)
+                    self.blue_knight_set = True
+                    self._switch_turn()
+                    return True
+            elif self.turn == BLUE and not self.red_knight_set:
+                # Blue places the red knight in rows 0-2 (red starting area)
+                if row < 3 and self.is_empty(row, col):
+                    self._place(self.red_knight, row, col)
+                    self.red_knight_set = True
+                    self._switch_turn()
+                    self.setup_phase = False
+                    return True
+            return False
+
+        # During the game, handle placing blocking boxes
+        if self.placing_box:
+            if self.is_empty(row, col):
+                self.place_box(row, col)
+                self.placing_box = False
+                self.change_turn()
+                return True
+
+        # Handle piece movement and selection
+        if self.selected_piece:
+            result = self._move(row, col)
+            if not result:
+                self.selected_piece = None
+                self.select(row, col)
+
+        piece = self.get_piece(row, col)
+        if isinstance(piece, Piece) and (
+                piece.color == self.turn or (piece.color == SPECIAL_RED and self.turn == RED) or (
+                piece.color == SPECIAL_BLUE and self.turn == BLUE)):
+            self.selected_piece = piece
+            self.valid_moves = self.get_valid_moves(piece)
+            return True
+
+        return False
+
+    def computer_place_enemy_knight(self):
+        """
+        Computer places the enemy knight during the setup phase.
+        """
+        if self.turn == BLUE and not self.red_knight_set:
+            for row in range(3):
+                for col in range(COLS):
+                    if self.is_empty(row, col):
+                        self._place(self.red_knight, row, col)
+                        self.red_knight_set = True
+                        self._switch_turn()
+                        self.setup_phase = False
+                        return
+
+    # Place a blocking box for the player whose turn it is
+    def place_box(self, row, col):
+        sq = square(row, col)
+        bit = 1 << sq
+        # Build new lists rather than appending so undo tokens can keep the old ones
+        if self.turn == RED:
+            self.hash ^= BOX_KEYS[0][6][sq]
+            self.red_box_mask |= bit
+            self.red_boxes = self.red_boxes + [((row, col), 6)]
+        else:
+            self.hash ^= BOX_KEYS[1][6][sq]
+            self.blue_box_mask |= bit
+            self.blue_boxes = self.blue_boxes + [((row, col), 6)]
+
+    # Execute the movement of a selected piece
+    def _move(self, row, col):
+        if self.selected_piece and (row, col) in self.valid_moves:
+            skipped = self.valid_moves[(row, col)]
+            # Clear the captured pieces first so a knight keeps the square it captures on
+            if skipped:
+                self.remove(skipped)
+            self.move(self.selected_piece, row, col)
+            self.change_turn()
+            self.check_winner()
+        else:
+            return False
+
+        return True
+
+    # Change the turn to the other player
+    def change_turn(self):
+        self.valid_moves = {}
+        self.selected_piece = None  # Reset the selected piece after turn change
+        self._switch_turn()
+        self.update_boxes()
+
+    def _switch_turn(self):
+        if self.turn == RED:
+            self.turn = BLUE
+        else:
+            self.turn = RED
+        self.hash ^= TURN_KEY
+
+    # Update the blocking boxes on the board
+    def update_boxes(self):
+        """
+        Update the blocking boxes on the board.
+        """
+        # Update red boxes
+        new_red_boxes = []
+        for position, turns in self.red_boxes:
+            sq = square(*position)
+            self.hash ^= BOX_KEYS[0][turns][sq]
+            if turns > 1:
+                new_red_boxes.append((position, turns - 1))
+                self.hash ^= BOX_KEYS[0][turns - 1][sq]
+            else:
+                self.red_box_mask &= ~(1 << sq)
+        self.red_boxes = new_red_boxes
+
+        # Update blue boxes
+        new_blue_boxes = []
+        for position, turns in self.blue_boxes:
+            sq = square(*position)
+            self.hash ^= BOX_KEYS[1][turns][sq]
+            if turns > 1:
+                new_blue_boxes.append((position, turns - 1))
+                self.hash ^= BOX_KEYS[1][turns - 1][sq]
+            else:
+                self.blue_box_mask &= ~(1 << sq)
+        self.blue_boxes = new_blue_boxes
+
+    # Remove captured pieces from the board
+    def remove(self, pieces):
+        for piece in pieces:
+            if isinstance(piece, Piece):
+                if piece.color == RED or piece.color == SPECIAL_RED:
+                    self.hash ^= count_key(CAPTURES_KEYS[1], self.blue_captures)
+                    self.blue_captures += 1
+                    self.hash ^= count_key(CAPTURES_KEYS[1], self.blue_captures)
+                else:
+                    self.hash ^= count_key(CAPTURES_KEYS[0], self.red_captures)
+                    self.red_captures += 1
+                    self.hash ^= count_key(CAPTURES_KEYS[0], self.red_captures)
+
+                self._lift(piece.row, piece.col)
+
+                if piece.knight:
+                    # Reset the knight's position if it's a knight
+                    piece.move(-1, -1)
+
+    # Get all valid moves for the selected piece
+    def get_valid_moves(self, piece):
+        """
+        Get all valid moves for the selected piece.
+        """
+        moves = {}
+        if piece.knight:
+            moves.update(self._knight_moves(piece))
+        else:
+            row = piece.row
+            col = piece.col
+
+            if piece.color == BLUE or piece.color == SPECIAL_BLUE or piece.king:
+                moves.update(self._traverse_forward(row - 1, max(row - 3, -1), -1, piece.color, col))
+            if piece.color == RED or piece.color == SPECIAL_RED or piece.king:
+                moves.update(self._traverse_forward(row + 1, min(row + 3, ROWS), 1, piece.color, col))
+
+        # print(f"Valid moves for piece at ({piece.row}, {piece.col}): {moves}")
+        return moves
+
+    # Traverse forward to find valid moves
+    def _traverse_forward(self, start, stop, step, color, col, skipped=[]):
+        """
+        Traverse forward to find valid moves.
+        """
+        moves = {}
+        last = []
+        if col < 0 or col >= COLS or start == stop:
+            return moves
+
+        boxes = self.red_box_mask | self.blue_box_mask
+        pieces = self.red_mask | self.blue_mask
+        friends = self.color_mask(color)
+        for r, bit, sq in COLUMN_STEPS[step][square(start, col)][:abs(stop - start)]:
+            if bit & boxes:  # Encountered a blocking box
+                break
+
+            if not bit & pieces:
+                if skipped and not last:
+                    break
+                elif skipped:
+                    moves[(r, col)] = last + skipped
+                else:
+                    moves[(r, col)] = last
+
+                if last:
+                    if step == -1:
+                        row = max(r - 3, -1)
+                    else:
+                        row = min(r + 3, ROWS)
+                    moves.update(self._traverse_forward(r + step, row, step, color, col, skipped=last))
+                break
+            elif bit & friends:
+                break
+            else:
+                last = [self.pieces[sq]]
+
+        return moves
+
+    # Get valid moves for a knight piece
+    def _knight_moves(self, piece):
+        moves = {}
+        # Boxes block the landing square and the knight never lands on its own side
+        targets = KNIGHT_TARGETS[square(piece.row, piece.col)]
+        targets &= ~(self.box_mask() | self.side_mask(piece.color))
+        for sq in squares(targets):
+            target = self.pieces[sq]
+            moves[divmod(sq, COLS)] = [target] if target else []
+
+        return moves
+
+    # Check if there is a winner
+    def check_winner(self):
+        if self.red_points >= 3:
+            self.winner = "Red"
+        if self.blue_points >= 3:
+            self.winner = "Blue"
+
+        red_pieces = self.red_mask.bit_count()
+        blue_pieces = self.blue_mask.bit_count()
+
+        if red_pieces == 0:
+            self.winner = "Blue"
+        if blue_pieces == 0:
+            self.winner = "Red"
+
+        if red_pieces == 1 and blue_pieces == 1:
+            self.winner = "Tie"
+
+        # Check if time has passed
+        elapsed_time = time.time() - self.start_time
+        if elapsed_time > GAME_TIME:  # 5 minutes
+            if self.red_points > self.blue_points:
+                self.winner = "Red"
+            elif self.blue_points > self.red_points:
+                self.winner = "Blue"
+            else:
+                if self.red_captures > self.blue_captures:
+                    self.winner = "Red"
+                elif self.blue_captures > self.red_captures:
+                    self.winner = "Blue"
+                else:
+                    self.winner = "Tie"
+
+        return self.winner
+
+    # Seconds left on the game clock
+    def remaining_time(self):
+        return max(0, GAME_TIME - (time.time() - self.start_time))
+
+    # Reset the board to the initial state
+    def reset(self):
+        self.__init__()
+        self.start_time = time.time()  # Reset the timer
+
+    # Get all valid moves for a given color
+    def get_all_valid_moves(self, color):
+        moves = []
+        steppers = 0
+        if color == RED or color == BLUE:
+            # A man with an empty square ahead has exactly one move, so skip the traversal for it
+            step = -1 if color == BLUE else 1
+            empty = ALL_SQUARES & ~self.occupied_mask()
+            steppers = self.color_mask(color) & ~self.king_mask & shift(empty, -step, 0)
+        for sq in squares(self._movers(color)):
+            piece = self.pieces[sq]
+            if (steppers >> sq) & 1:
+                moves.append((piece, (piece.row + step, piece.col), []))
+                continue
+            valid_moves = self.get_valid_moves(piece)
+            for move, skipped in valid_moves.items():
+                moves.append((piece, move, skipped))
+        return moves
+
+
+
+    # Pieces of this color with at least one move, found for all of them at once
+    def _movers(self, color):
+        pieces = self.color_mask(color)
+        if color == SPECIAL_RED or color == SPECIAL_BLUE:
+            return pieces
+        empty = ALL_SQUARES & ~self.occupied_mask()
+        jumpable = (self.red_mask | self.blue_mask) & ~pieces
+        movers = 0
+        for step in (-1, 1):
+            walkers = pieces if (step == -1) == (color == BLUE) else pieces & self.king_mask
+            step_or_jump = shift(empty, -step, 0) | (shift(jumpable, -step, 0) & shift(empty, -2 * step, 0))
+            movers |= walkers & step_or_jump
+        return movers
+
+    def is_piece_in_danger(self, piece):
+        """
+        Check if the given piece is in danger of being captured.
+        """
+        others = (self.red_mask | self.blue_mask) & ~self.color_mask(piece.color)
+        empty = ALL_SQUARES & ~self.occupied_mask()
+        for neighbour, behind in DIAGONAL_STEPS[square(piece.row, piece.col)]:
+            # Check if the opponent can capture the piece in the next move
+            if neighbour & others and behind & empty:
+                return True
+        return False
+
+    def is_future_move_safe(self, piece, move_pos):
+        """
+        Check if moving to move_pos would result in the piece being threatened.
+        """
+        row, col = move_pos
+        opponent_color = RED if piece.color == BLUE else BLUE
+
+        if self._is_threat_from_diagonals(row, col, opponent_color):
+            return False
+
+        if self._is_threat_from_knight(row, col, opponent_color):
+            return False
+
+        return True
+
+    def _is_threat_from_diagonals(self, row, col, opponent_color):
+        """
+        Check if there are threats from diagonals.
+        """
+        opponents = self.side_mask(opponent_color)
+        opponent_men = self.color_mask(opponent_color)
+        empty = ALL_SQUARES & ~self.occupied_mask()
+
+        for neighbour, behind in DIAGONAL_STEPS[square(row, col)]:
+            if neighbour & opponents:
+                # An adjacent opponent with an empty square behind it
+                if behind & empty:
+                    return True
+                # Check for threats two steps ahead
+                if neighbour & opponent_men and behind & opponents:
+                    return True
+
+        return False
+
+    def _is_threat_from_knight(self, row, col, opponent_color):
+        """
+        Check if there are threats from knight pieces.
+        """
+        knights = self.side_mask(opponent_color) & self.knight_mask
+        return bool(KNIGHT_TARGETS[square(row, col)] & knights)
+
+    def is_knight_capture_possible(self, piece):
+        """
+        Check if the knight can capture an opponent piece.
+        """
+        others = (self.red_mask | self.blue_mask) & ~self.color_mask(piece.color)
+        return bool(KNIGHT_TARGETS[square(piece.row, piece.col)] & others)
+
+    def should_place_box(self):
+        """
+        Decide whether to place a box and return the position if true.
+        """
+        opponent_color = RED if self.turn == BLUE else BLUE
+        row_n_minus_1 = ROWS - 2 if opponent_color == RED else 1
+        row_n = ROWS - 1 if opponent_color == RED else 0
+
+        # Check if the enemy has a soldier in row n-1 and row n in the same column is still empty
+        approaching = self.side_mask(opponent_color) & ROW_MASKS[row_n_minus_1]
+        open_squares = shift(approaching, row_n - row_n_minus_1, 0) & ~self.occupied_mask()
+        if open_squares:
+            # Place a box in row n in the same column to prevent the opponent from reaching the last row
+            return divmod((open_squares & -open_squares).bit_length() - 1, COLS)
+
+        return None
+
+
+
+    def make_move(self, move):
+        """
+        Play a move in place and return a token that unmake_move uses to take it back.
+        A move is (piece, (row, col), skipped) as built by get_all_valid_moves, or
+        (None, (row, col), []) to place a blocking box for the player to move.
+        """
+        piece, (row, col), skipped = move
+        token = (
+            move, piece.row if piece else -1, piece.col if piece else -1,
+            [(captured, captured.row, captured.col) for captured in skipped],
+            self.red_mask, self.blue_mask, self.king_mask, self.knight_mask,
+            self.red_box_mask, self.blue_box_mask, self.red_boxes, self.blue_boxes,
+            self.red_captures, self.blue_captures, self.red_points, self.blue_points,
+            self.turn, self.winner, self.hash,
+        )
+
+        if piece is None:
+            self.place_box(row, col)
+        else:
+            if skipped:
+                self.remove(skipped)
+            self.move(piece, row, col)
+
+        # Same as change_turn, without touching the selection shown by the GUI
+        self._switch_turn()
+        self.update_boxes()
+        self.check_winner()
+        return token
+
+    def unmake_move(self, token):
+        """
+        Restore the position from before the make_move call that returned token.
+        """
+        (move, from_row, from_col, captured_pieces,
+         self.red_mask, self.blue_mask, self.king_mask, self.knight_mask,
+         self.red_box_mask, self.blue_box_mask, self.red_boxes, self.blue_boxes,
+         self.red_captures, self.blue_captures, self.red_points, self.blue_points,
+         self.turn, self.winner, self.hash) = token
+
+        piece, (row, col), _ = move
+        if piece is None:
+            return
+        self.pieces[square(row, col)] = None
+        for captured, captured_row, captured_col in captured_pieces:
+            self.pieces[square(captured_row, captured_col)] = captured
+            captured.move(captured_row, captured_col)
+        self.pieces[square(from_row, from_col)] = piece
+        piece.move(from_row, from_col)
+
+    def compute_hash(self):
+        """
+        Zobrist hash rebuilt from scratch; self.hash is kept equal to this incrementally.
+        """
+        value = 0
+        for sq in squares(self.red_mask | self.blue_mask):
+            value ^= PIECE_KEYS[piece_kind(self.pieces[sq])][sq]
+        for owner, boxes in enumerate((self.red_boxes, self.blue_boxes)):
+            for position, turns in boxes:
+                value ^= BOX_KEYS[owner][turns][square(*position)]
+        if self.turn == BLUE:
+            value ^= TURN_KEY
+        value ^= count_key(POINTS_KEYS[0], self.red_points) ^ count_key(POINTS_KEYS[1], self.blue_points)
+        value ^= count_key(CAPTURES_KEYS[0], self.red_captures) ^ count_key(CAPTURES_KEYS[1], self.blue_captures)
+        return value
+
+    def to_position(self):
+        """
+        Compact snapshot of the rules state made of ints and tuples only, cheap to
+        pickle and send to another process. Board.from_position rebuilds the board.
+        """
+        return (
+            self.red_mask, self.blue_mask, self.king_mask, self.knight_mask,
+            tuple(self.red_boxes), tuple(self.blue_boxes), self.turn,
+            self.red_points, self.blue_points, self.red_captures, self.blue_captures,
+            self.red_knight_set, self.blue_knight_set, self.setup_phase, self.winner, self.start_time,
+        )
+
+    @classmethod
+    def from_position(cls, position):
+        (red_mask, blue_mask, king_mask, knight_mask, red_boxes, blue_boxes, turn,
+         red_points, blue_points, red_captures, blue_captures,
+         red_knight_set, blue_knight_set, setup_phase, winner, start_time) = position
+        board = cls()
+        board.pieces = [None] * (ROWS * COLS)
+        board.red_mask = board.blue_mask = board.king_mask = board.knight_mask = 0
+        for sq in squares(red_mask | blue_mask):
+            row, col = divmod(sq, COLS)
+            bit = 1 << sq
+            red = bool(red_mask & bit)
+            if knight_mask & bit:
+                piece = board.red_knight if red else board.blue_knight
+            else:
+                piece = Piece(row, col, RED if red else BLUE, is_king=bool(king_mask & bit))
+            board._place(piece, row, col)
+        board.red_boxes = list(red_boxes)
+        board.blue_boxes = list(blue_boxes)
+        board.red_box_mask = sum(1 << square(*box) for box, _ in red_boxes)
+        board.blue_box_mask = sum(1 << square(*box) for box, _ in blue_boxes)
+        board.turn = turn
+        board.red_points, board.blue_points = red_points, blue_points
+        board.red_captures, board.blue_captures = red_captures, blue_captures
+        board.red_knight_set, board.blue_knight_set = red_knight_set, blue_knight_set
+        board.setup_phase = setup_phase
+        board.winner = winner
+        board.start_time = start_time
+        board.hash = board.compute_hash()
+        return board
+
+    def to_text(self):
+        """
+        One-line text form of the position: the rows from row 0 down joined by '/', then the
+        player to move ('r' or 'b'), red points, blue points, red captures and blue captures.
+        Red is lower case and blue upper case: m/M a man, k/K a king, n/N the knight,
+        a-f/A-F a box with 1-6 turns left, '.' an empty square.
+        """
+        rows = []
+        for row in range(ROWS):
+            cells = []
+            for col in range(COLS):
+                cells.append(self._text_cell(row, col))
+            rows.append(''.join(cells))
+        turn = 'r' if self.turn == RED else 'b'
+        return (f"{'/'.join(rows)} {turn} {self.red_points} {self.blue_points} "
+                f"{self.red_captures} {self.blue_captures}")
+
+    def _text_cell(self, row, col):
+        piece = self.pieces[square(row, col)]
+        if piece is None:
+            for boxes, letters in ((self.red_boxes, 'abcdef'), (self.blue_boxes, 'ABCDEF')):
+                for position, turns in boxes:
+                    if position == (row, col):
+                        return letters[turns - 1]
+            return '.'
+        cell = 'n' if piece.knight else 'k' if piece.king else 'm'
+        return cell if side_of(piece.color) == RED else cell.upper()
+
+    @classmethod
+    def from_text(cls, text):
+        """
+        Build a board from the to_text form, past the setup phase.
+        """
+        fields = text.split()
+        if len(fields) != 6:
+            raise ValueError(f"Expected a board and 5 fields, got {text!r}")
+        rows = fields[0].split('/')
+        if len(rows) != ROWS or any(len(cells) != COLS for cells in rows):
+            raise ValueError(f"Expected {ROWS} rows of {COLS} squares, got {fields[0]!r}")
+        if fields[1] not in ('r', 'b'):
+            raise ValueError(f"Player to move must be 'r' or 'b', got {fields[1]!r}")
+
+        red_mask = blue_mask = king_mask = knight_mask = 0
+        red_boxes, blue_boxes = [], []
+        for row, cells in enumerate(rows):
+            for col, cell in enumerate(cells):
+                bit = 1 << square(row, col)
+                if cell == '.':
+                    continue
+                if cell in 'abcdef':
+                    red_boxes.append(((row, col), 'abcdef'.index(cell) + 1))
+                elif cell in 'ABCDEF':
+                    blue_boxes.append(((row, col), 'ABCDEF'.index(cell) + 1))
+                elif cell.lower() in 'mkn':
+                    if cell.islower():
+                        red_mask |= bit
+                    else:
+                        blue_mask |= bit
+                    if cell.lower() == 'k':
+                        king_mask |= bit
+                    elif cell.lower() == 'n':
+                        knight_mask |= bit
+                else:
+                    raise ValueError(f"Unknown square {cell!r} in {fields[0]!r}")
+
+        red_points, blue_points, red_captures, blue_captures = (int(field) for field in fields[2:])
+        board = cls.from_position((
+            red_mask, blue_mask, king_mask, knight_mask, tuple(red_boxes), tuple(blue_boxes),
+            RED if fields[1] == 'r' else BLUE, red_points, blue_points, red_captures, blue_captures,
+            True, True, False, None, time.time(),
+        ))
+        board.check_winner()
+        return board
+
+    # Create a copy of the board
+    def copy(self):
+        new_board = copy.deepcopy(self)
+        return new_board
+
+
+# Weights of the evaluation terms, read at every call so a match can try other values
+DANGER_WEIGHT = 3  # Per man on a square the opponent could capture it on
+KNIGHT_TARGET_WEIGHT = 5  # Per man a knight jump could capture
+CAPTURE_WEIGHT = 10  # Per link of a jump chain a man could make
+
+
+def evaluate(board):
+    """
+    Evaluate the board and return a score.
+    """
+    red, blue, knights = board.red_mask, board.blue_mask, board.knight_mask
+    red_men, blue_men = red & ~knights, blue & ~knights
+    empty = ALL_SQUARES & ~(red | blue | board.red_box_mask | board.blue_box_mask)
+
+    score = board.blue_points - board.red_points
+    # Reward for blue pieces, blue men move up the board
+    score += _side_score(blue_men, blue_men & board.king_mask, red, red_men, red & knights, red | (blue & knights), empty, -1)
+    # Penalize for red pieces, red men move down the board
+    score -= _side_score(red_men, red_men & board.king_mask, blue, blue_men, blue & knights, blue | (red & knights), empty, 1)
+    return score
+
+
+def _side_score(men, kings, opponents, opponent_men, opponent_knights, others, empty, forward):
+    """
+    Score the men of one color, working on whole bitboards instead of piece by piece.
+    Knights carry their SPECIAL color, so like the per-piece version this only counts men.
+    The shifts are written out rather than calling shift(): evaluate runs at every leaf.
+    """
+    if not men:
+        return 0
+
+    # Squares a piece of this color could not move to safely (see is_future_move_safe):
+    # next to an opponent with an empty square behind us, or an opponent man with another opponent behind it
+    threatened = knight_attacks(opponent_knights)
+    for offset, guard, guard_2 in ((COLS + 1, RIGHT_1, RIGHT_2), (COLS - 1, LEFT_1, LEFT_2)):
+        near, near_men = opponents & guard, opponent_men & guard
+        far, far_empty = opponents & guard_2, empty & guard_2
+        threatened |= (near << offset) & ((far_empty << 2 * offset) | ((near_men << offset) & (far << 2 * offset)))
+    for offset, guard, guard_2 in ((COLS - 1, RIGHT_1, RIGHT_2), (COLS + 1, LEFT_1, LEFT_2)):
+        near, near_men = opponents & guard, opponent_men & guard
+        far, far_empty = opponents & guard_2, empty & guard_2
+        threatened |= (near >> offset) & ((far_empty >> 2 * offset) | ((near_men >> offset) & (far >> 2 * offset)))
+
+    score = men.bit_count()
+    score -= DANGER_WEIGHT * (men & threatened).bit_count()  # Higher penalty for pieces in danger
+    # Reward if a knight jump could capture
+    score += KNIGHT_TARGET_WEIGHT * (men & knight_attacks(others)).bit_count()
+
+    # Reward for capture moves: every link of a jump chain along the column is one move
+    for step, chain in ((forward, men), (-forward, kings)):
+        distance = 1
+        while chain:
+            if step == 1:
+                chain &= (others >> distance * COLS) & (empty >> (distance + 1) * COLS)
+            else:
+                chain &= (others << distance * COLS) & (empty << (distance + 1) * COLS)
+            score += CAPTURE_WEIGHT * chain.bit_count()
+            distance += 2
+
+    return score
+
+
+# Bound types of a stored score
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2
+
+
+class TranspositionTable:
+    """
+    Fixed-size table of search results keyed by Board.hash.
+    Each bucket has a depth-preferred slot, which keeps the deepest search of a position,
+    and an always-replace slot that takes whatever the depth-preferred slot turned away.
+    """
+    ENTRY_BYTES = 128  # Rough size of one stored entry tuple, used to turn megabytes into buckets
+
+    def __init__(self, size_mb=16):
+        buckets = max(1, size_mb * 1024 * 1024 // (2 * self.ENTRY_BYTES))
+        self.mask = (1 << (buckets.bit_length() - 1)) - 1  # Power of two so the index is key & mask
+        self.deep = [None] * (self.mask + 1)
+        self.recent = [None] * (self.mask + 1)
+
+    def probe(self, key):
+        """
+        Return (key, depth, score, bound, move_key) for the position, or None.
+        """
+        index = key & self.mask
+        entry = self.deep[index]
+        if entry is not None and entry[0] == key:
+            return entry
+        entry = self.recent[index]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, score, bound, best_move_key):
+        index = key & self.mask
+        entry = (key, depth, score, bound, best_move_key)
+        deep = self.deep[index]
+        if deep is None or deep[0] == key or depth >= deep[1]:
+            self.deep[index] = entry
+        else:
+            self.recent[index] = entry
+
+    def clear(self):
+        self.deep = [None] * (self.mask + 1)
+        self.recent = [None] * (self.mask + 1)
+
+
+class SharedTranspositionTable:
+    """
+    TranspositionTable kept in multiprocessing.shared_memory so several processes can fill
+    and probe the same table. The buffer is a flat array of 64-bit words, four per bucket:
+    (key ^ data, data) for the depth-preferred slot, then the same for the always-replace slot.
+    Writes take no lock; a slot torn by two processes writing at once no longer matches its key
+    and reads as a miss.
+    Open an existing table in another process with SharedTranspositionTable(name=table.name).
+    """
+    BUCKET_BYTES = 32
+    SCORE_OFFSET = 1 << 31  # Scores are stored as unsigned 32-bit numbers
+    NO_MOVE = 0xFF
+    VALID = 1 << 58  # Set in every stored data word, so a zeroed slot is empty
+
+    def __init__(self, size_mb=16, name=None):
+        if name is None:
+            buckets = max(1, size_mb * 1024 * 1024 // self.BUCKET_BYTES)
+            buckets = 1 << (buckets.bit_length() - 1)
+            self.shm = shared_memory.SharedMemory(create=True, size=buckets * self.BUCKET_BYTES)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            buckets = 1 << ((self.shm.size // self.BUCKET_BYTES).bit_length() - 1)
+            self.owner = False
+        self.name = self.shm.name
+        self.mask = buckets - 1
+        self.words = self.shm.buf[:buckets * self.BUCKET_BYTES].cast('Q')
+        if self.owner:
+            self.clear()
+
+    def _pack(self, depth, score, bound, best_move_key):
+        if score == float('inf'):
+            score = 0xFFFFFFFF
+        elif score == float('-inf'):
+            score = 0
+        else:
+            score = min(max(int(score) + self.SCORE_OFFSET, 1), 0xFFFFFFFE)
+        if best_move_key is None:
+            from_sq, to_sq = -1, self.NO_MOVE
+        else:
+            from_sq, to_sq = best_move_key
+        return self.VALID | (to_sq << 50) | ((from_sq + 1) << 42) | (bound << 40) | (min(depth, 0xFF) << 32) | score
+
+    def _unpack(self, key, data):
+        score = data & 0xFFFFFFFF
+        if score == 0xFFFFFFFF:
+            score = float('inf')
+        elif score == 0:
+            score = float('-inf')
+        else:
+            score -= self.SCORE_OFFSET
+        to_sq = (data >> 50) & 0xFF
+        best_move_key = None if to_sq == self.NO_MOVE else (((data >> 42) & 0xFF) - 1, to_sq)
+        return key, (data >> 32) & 0xFF, score, (data >> 40) & 0x3, best_move_key
+
+    def probe(self, key):
+        """
+        Return (key, depth, score, bound, move_key) for the position, or None.
+        """
+        words = self.words
+        slot = (key & self.mask) * 4
+        for slot in (slot, slot + 2):
+            data = words[slot + 1]
+            if data & self.VALID and words[slot] ^ data == key:
+                return self._unpack(key, data)
+        return None
+
+    def store(self, key, depth, score, bound, best_move_key):
+        words = self.words
+        slot = (key & self.mask) * 4
+        data = words[slot + 1]
+        if data & self.VALID and words[slot] ^ data != key and depth < (data >> 32) & 0xFF:
+            slot += 2  # The depth-preferred slot holds a deeper search of another position
+        data = self._pack(depth, score, bound, best_move_key)
+        words[slot + 1] = data
+        words[slot] = key ^ data
+
+    def clear(self):
+        self.shm.buf[:len(self.words) * 8] = bytes(len(self.words) * 8)
+
+    def close(self):
+        self.words.release()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside minimax when the search runs past its deadline.
+    """
+
+
+class SearchStats:
+    """
+    What one search did and where its time went, collected while SearchState.stats is set.
+    Only the searching process is counted; nodes searched by parallel workers are only
+    added to total_nodes.
+    """
+
+    def __init__(self):
+        self.nodes = 0  # negamax nodes
+        self.quiescence_nodes = 0
+        self.evaluations = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0  # Nodes answered by the table without a search
+        self.tablebase_hits = 0
+        self.cutoffs = []  # Beta cutoffs by the index of the move that caused them
+        self.ply_nodes = []  # negamax nodes by distance from the root
+        self.max_ply = 0  # Deepest node reached, quiescence included
+        self.movegen_time = 0.0
+        self.evaluate_time = 0.0
+        self.make_time = 0.0  # make_move and unmake_move
+        self.iterations = []  # (depth, score, total nodes, seconds since the start) of every finished depth
+        self.depth = 0
+        self.score = None
+        self.best_move = None  # move_key of the move found
+        self.total_nodes = 0
+        self.elapsed = 0.0
+        self.position = None  # Board.to_text of the searched position
+        self.from_book = False
+
+    # Record the result (score, best_move, depth) of the search of board
+    def finish(self, board, result, total_nodes, elapsed, from_book=False):
+        score, move, self.depth = result
+        self.score = score
+        self.best_move = move_key(move) if move is not None else None
+        self.total_nodes = total_nodes
+        self.elapsed = elapsed
+        self.position = board.to_text()
+        self.from_book = from_book
+
+    def visit(self, ply):
+        self.nodes += 1
+        while len(self.ply_nodes) <= ply:
+            self.ply_nodes.append(0)
+        self.ply_nodes[ply] += 1
+        self.max_ply = max(self.max_ply, ply)
+
+    def cutoff(self, index):
+        while len(self.cutoffs) <= index:
+            self.cutoffs.append(0)
+        self.cutoffs[index] += 1
+
+    # Average number of children searched below each ply
+    def branching_factors(self):
+        return [round(children / nodes, 2) for nodes, children in zip(self.ply_nodes, self.ply_nodes[1:]) if nodes]
+
+    def to_dict(self):
+        return {
+            'position': self.position, 'from_book': self.from_book, 'depth': self.depth, 'score': self.score,
+            'best_move': self.best_move,
+            'elapsed': round(self.elapsed, 4), 'total_nodes': self.total_nodes, 'nodes': self.nodes,
+            'quiescence_nodes': self.quiescence_nodes, 'evaluations': self.evaluations, 'max_ply': self.max_ply,
+            'tt_probes': self.tt_probes, 'tt_hits': self.tt_hits, 'tt_cutoffs': self.tt_cutoffs,
+            'tablebase_hits': self.tablebase_hits,
+            'cutoffs': self.cutoffs, 'ply_nodes': self.ply_nodes, 'branching_factors': self.branching_factors(),
+            'movegen_time': round(self.movegen_time, 4), 'evaluate_time': round(self.evaluate_time, 4),
+            'make_time': round(self.make_time, 4), 'iterations': self.iterations,
+        }
+
+    # Append the statistics to a JSON lines file, one line per search
+    def write(self, path):
+        with open(path, 'a') as file:
+            file.write(json.dumps(self.to_dict()) + '\n')
+
+
+class SearchState:
+    """
+    Bookkeeping shared by every node of one search.
+    """
+    CHECK_INTERVAL = 64  # Nodes between clock checks
+
+    def __init__(self, deadline=None, stats=None, tablebase=None):
+        self.deadline = deadline
+        self.nodes = 0
+        self.depth = 0  # Depth of the iteration in progress
+        self.stopped = False  # Set from another thread to abandon the search
+        self.stats = stats  # SearchStats to fill in, or None to search without them
+        self.tablebase = tablebase  # Tablebase that ends the search of the positions it covers
+        self.killers = {}  # Ply -> the last two quiet moves that caused a cutoff there, newest first
+        self.history = {}  # Move key -> cutoff credit of a quiet move, depth squared per cutoff
+
+    def out_of_time(self):
+        return self.stopped or (self.deadline is not None and time.time() > self.deadline)
+
+    # Remember a quiet move that refuted a position, for ordering its siblings and later searches
+    def record_cutoff(self, move, depth, ply):
+        if is_tactical(move):
+            return
+        key = move_key(move)
+        killers = self.killers.setdefault(ply, [])
+        if key not in killers:
+            killers.insert(0, key)
+            del killers[2:]
+        self.history[key] = self.history.get(key, 0) + depth * depth
+
+
+# Compact, board-independent form of a move: (from square, to square), from is -1 for a box
+def move_key(move):
+    piece, (row, col), _ = move
+    return (square(piece.row, piece.col) if piece else -1, square(row, col))
+
+
+# Captures and moves that score a point; every other move is quiet
+def is_tactical(move):
+    piece, (row, col), skipped = move
+    if piece is None:
+        return False
+    return bool(skipped) or (piece.color == RED and row == ROWS - 1) or (piece.color == BLUE and row == 0)
+
+
+# Ranks used by order_moves, each above every rank after it
+TT_MOVE_RANK = 1 << 40
+CAPTURE_RANK = 1 << 36
+SCORING_RANK = 1 << 34
+KILLER_RANK = 1 << 32
+
+
+def order_moves(moves, tt_move=None, killers=(), history=None):
+    """
+    Sort moves best first for alpha-beta: the best move from an earlier visit (tt_move),
+    captures by the number of pieces taken, moves that score a point, the killer moves,
+    then the quiet moves by history. Equal moves keep their board-scan order.
+    """
+    def rank(move):
+        piece, (row, col), skipped = move
+        key = (piece.row * COLS + piece.col, row * COLS + col)  # move_key, inlined
+        if key == tt_move:
+            return TT_MOVE_RANK
+        if skipped:
+            return CAPTURE_RANK + len(skipped)
+        if (piece.color == RED and row == ROWS - 1) or (piece.color == BLUE and row == 0):
+            return SCORING_RANK
+        if key in killers:
+            return KILLER_RANK + 1 - killers.index(key)
+        return history.get(key, 0) if history else 0
+
+    return sorted(moves, key=rank, reverse=True)
+
+
+def candidate_moves(board, tt_move=None, state=None, ply=0):
+    """
+    Moves minimax searches for the player to move: the safe ones if there are any,
+    in order_moves order with the killers and history of state.
+    """
+    valid_moves = board.get_all_valid_moves(board.turn)
+    safe_moves = []
+
+    for move in valid_moves:
+        piece, move_pos, skipped = move
+        if board.is_future_move_safe(piece, move_pos):
+            safe_moves.append(move)
+
+    # If no safe moves are found, use the valid moves as a fallback
+    moves_to_consider = safe_moves if safe_moves else valid_moves
+
+    if state is None:
+        return order_moves(moves_to_consider, tt_move)
+    return order_moves(moves_to_consider, tt_move, state.killers.get(ply, ()), state.history)
+
+
+def tactical_moves(board):
+    """
+    Captures and point-scoring moves of the player to move, captures by the player's
+    knight included, in order_moves order.
+    """
+    moves = [move for move in board.get_all_valid_moves(board.turn) if is_tactical(move)]
+    knight = board.red_knight if board.turn == RED else board.blue_knight
+    if knight.row >= 0:
+        moves.extend((knight, position, skipped) for position, skipped in board.get_valid_moves(knight).items()
+                     if skipped)
+    return order_moves(moves)
+
+
+QUIESCENCE_DEPTH = 6  # Most captures and scoring moves played out past the nominal depth
+
+
+# evaluate, make_move and unmake_move, timed into stats unless it is None
+def timed_evaluate(board, stats):
+    if stats is None:
+        return evaluate(board)
+    started = time.perf_counter()
+    score = evaluate(board)
+    stats.evaluations += 1
+    stats.evaluate_time += time.perf_counter() - started
+    return score
+
+
+def timed_make_move(board, move, stats):
+    if stats is None:
+        return board.make_move(move)
+    started = time.perf_counter()
+    token = board.make_move(move)
+    stats.make_time += time.perf_counter() - started
+    return token
+
+
+def timed_unmake_move(board, token, stats):
+    if stats is None:
+        return board.unmake_move(token)
+    started = time.perf_counter()
+    board.unmake_move(token)
+    stats.make_time += time.perf_counter() - started
+
+
+def quiescence(board, alpha, beta, color, state, ply=0, depth=QUIESCENCE_DEPTH):
+    """
+    Score of a search leaf once its captures and scoring moves have been played out,
+    for the side of color as in negamax. The player to move may stand pat on evaluate
+    instead of making any of them.
+    """
+    state.nodes += 1
+    if state.nodes % state.CHECK_INTERVAL == 0 and state.out_of_time():
+        raise SearchTimeout
+    stats = state.stats
+    if stats is not None:
+        stats.quiescence_nodes += 1
+        stats.max_ply = max(stats.max_ply, ply)
+    if state.tablebase is not None:
+        score = state.tablebase.probe(board, ply)
+        if score is not None:
+            if stats is not None:
+                stats.tablebase_hits += 1
+            return score
+
+    stand_pat = color * timed_evaluate(board, stats)
+    if depth == 0 or board.winner or stand_pat >= beta:
+        return stand_pat
+    alpha = max(alpha, stand_pat)
+
+    if stats is None:
+        moves = tactical_moves(board)
+    else:
+        started = time.perf_counter()
+        moves = tactical_moves(board)
+        stats.movegen_time += time.perf_counter() - started
+
+    best_score = stand_pat
+    for move in moves:
+        token = timed_make_move(board, move, stats)
+        try:
+            score = -quiescence(board, -beta, -alpha, -color, state, ply + 1, depth - 1)
+        finally:
+            timed_unmake_move(board, token, stats)
+        if score > best_score:
+            best_score = score
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+    return best_score
+
+
+def minimax(board, depth, alpha, beta, maximizing_player, tt=None, state=None, ply=0):
+    """
+    Search board depth plies deep and return (score, best move). Scores are evaluate's,
+    Blue maximizing and Red minimizing; the search itself is negamax.
+    """
+    if maximizing_player:
+        return negamax(board, depth, alpha, beta, 1, tt, state, ply)
+    score, move = negamax(board, depth, -beta, -alpha, -1, tt, state, ply)
+    return -score, move
+
+
+def negamax(board, depth, alpha, beta, color, tt=None, state=None, ply=0):
+    """
+    Principal variation search. Scores are for the side of color, 1 for the maximizing
+    player and -1 for the minimizing one, and so are the scores kept in tt. The first
+    move is searched with the full window, the others with a null window just above
+    alpha, and only a move that lands inside the window is searched again in full.
+    """
+    if state is None:
+        state = SearchState()  # Holds the killers and history of this search
+    state.nodes += 1
+    if state.nodes % state.CHECK_INTERVAL == 0 and state.out_of_time():
+        raise SearchTimeout
+
+    stats = state.stats
+    if stats is not None:
+        stats.visit(ply)
+
+    # The root is still searched so there is a move to play, every move from it is then probed
+    if ply and state.tablebase is not None:
+        score = state.tablebase.probe(board, ply)  # For the player to move, the side of color
+        if score is not None:
+            if stats is not None:
+                stats.tablebase_hits += 1
+            return score, None
+    if board.winner:
+        return color * timed_evaluate(board, stats), None
+    if depth == 0:
+        return quiescence(board, alpha, beta, color, state, ply, QUIESCENCE_DEPTH), None
+
+    tt_move = None
+    if tt is not None:
+        entry = tt.probe(board.hash)
+        if stats is not None:
+            stats.tt_probes += 1
+            stats.tt_hits += entry is not None
+        if entry is not None:
+            _, entry_depth, entry_score, bound, tt_move = entry
+            if entry_depth >= depth:
+                if bound == LOWER_BOUND:
+                    alpha = max(alpha, entry_score)
+                elif bound == UPPER_BOUND:
+                    beta = min(beta, entry_score)
+                if bound == EXACT or beta <= alpha:
+                    if stats is not None:
+                        stats.tt_cutoffs += 1
+                    if ply:
+                        return entry_score, None  # Below the root only the score is used
+                    moves = board.get_all_valid_moves(board.turn)
+                    return entry_score, next((move for move in moves if move_key(move) == tt_move), None)
+
+    if stats is None:
+        moves = candidate_moves(board, tt_move, state, ply)
+    else:
+        started = time.perf_counter()
+        moves = candidate_moves(board, tt_move, state, ply)
+        stats.movegen_time += time.perf_counter() - started
+
+    window_alpha = alpha
+    best_score = float('-inf')
+    best_move = None
+    for index, move in enumerate(moves):
+        token = timed_make_move(board, move, stats)
+        try:
+            # Scores are whole numbers, so (alpha, alpha + 1) is a null window
+            if index == 0 or alpha == float('-inf'):
+                score = -negamax(board, depth - 1, -beta, -alpha, -color, tt, state, ply + 1)[0]
+            else:
+                score = -negamax(board, depth - 1, -alpha - 1, -alpha, -color, tt, state, ply + 1)[0]
+                if alpha < score < beta:
+                    score = -negamax(board, depth - 1, -beta, -score, -color, tt, state, ply + 1)[0]
+        finally:
+            timed_unmake_move(board, token, stats)
+        if score > best_score:
+            best_score = score
+            best_move = move
+        alpha = max(alpha, score)
+        if alpha >= beta:
+            state.record_cutoff(move, depth, ply)
+            if stats is not None:
+                stats.cutoff(index)
+            break
+
+    if tt is not None and best_move is not None:
+        tt.store(board.hash, depth, best_score, score_bound(best_score, window_alpha, beta), move_key(best_move))
+    return best_score, best_move
+
+
+# How a score found with the window (alpha, beta) bounds the true score
+def score_bound(score, alpha, beta):
+    if score <= alpha:
+        return UPPER_BOUND
+    if score >= beta:
+        return LOWER_BOUND
+    return EXACT
+
+
+# Set in each worker process of a RootParallelSearch pool
+_worker_bound = None
+_worker_stop = None
+_worker_tt = None
+
+
+def _init_root_worker(bound, stop):
+    global _worker_bound, _worker_stop, _worker_tt
+    _worker_bound = bound
+    _worker_stop = stop
+    _worker_tt = TranspositionTable()  # Lives as long as the worker, so later depths reuse it
+
+
+class _WorkerSearchState(SearchState):
+    def out_of_time(self):
+        return bool(_worker_stop.value) or super().out_of_time()
+
+
+def _search_root_move(position, key, depth, deadline, limit, tablebase_path=None):
+    """
+    Search one root move in a worker process, starting from the best root score found so far
+    and up to limit, the other side of the root window. The worker opens the tablebase at
+    tablebase_path itself, if there is one.
+    Returns (move key, score or None on timeout, the bound searched from, nodes searched).
+    A score not past that bound only says the move is no better than it.
+    """
+    board = Board.from_position(position)
+    move = next(move for move in board.get_all_valid_moves(board.turn) if move_key(move) == key)
+    maximizing_player = board.turn == BLUE
+    state = _WorkerSearchState(deadline, tablebase=tablebase_at(tablebase_path))
+    best = _worker_bound.value
+    if (best >= limit) if maximizing_player else (best <= limit):
+        # Another root move already failed high; an empty window would only leave wrong bounds in _worker_tt
+        return key, best, best, 0
+    board.make_move(move)
+    try:
+        if maximizing_player:
+            score, _ = minimax(board, depth - 1, best, limit, False, _worker_tt, state, 1)
+        else:
+            score, _ = minimax(board, depth - 1, limit, best, True, _worker_tt, state, 1)
+    except SearchTimeout:
+        return key, None, best, state.nodes
+
+    with _worker_bound.get_lock():
+        if (score > _worker_bound.value) if maximizing_player else (score < _worker_bound.value):
+            _worker_bound.value = score
+    return key, score, best, state.nodes
+
+
+class RootParallelSearch:
+    """
+    Root-parallel minimax over a process pool. The first root move is searched here with
+    the whole window, then the remaining root moves go to the workers (young brothers wait).
+    Workers share the best root score so far and start every root move from it, and get
+    the position as Board.to_position instead of a pickled Board.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.bound = multiprocessing.Value('d', 0.0)
+        self.stop = multiprocessing.Value('b', 0)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_root_worker,
+                                        initargs=(self.bound, self.stop))
+
+    def search(self, board, depth, tt=None, state=None, alpha=float('-inf'), beta=float('inf')):
+        """
+        Same result as minimax(board, depth, alpha, beta, board.turn == BLUE, tt, state).
+        """
+        maximizing_player = board.turn == BLUE
+        entry = tt.probe(board.hash) if tt is not None else None
+        moves = candidate_moves(board, entry[4] if entry else None, state)
+        if depth <= 1 or len(moves) < 2:
+            return minimax(board, depth, alpha, beta, maximizing_player, tt, state)
+
+        # The eldest brother sets the bound the others are searched against
+        token = board.make_move(moves[0])
+        try:
+            best_score, _ = minimax(board, depth - 1, alpha, beta, not maximizing_player, tt, state, 1)
+        finally:
+            board.unmake_move(token)
+        best_move = moves[0]
+
+        # A root score past the window ends the search, the caller opens the window and asks again
+        def fails_high(score):
+            return score >= beta if maximizing_player else score <= alpha
+
+        def better(score, than):
+            return score > than if maximizing_player else score < than
+
+        if fails_high(best_score):
+            return best_score, best_move
+        self.bound.value = max(best_score, alpha) if maximizing_player else min(best_score, beta)
+        self.stop.value = 0
+
+        position = board.to_position()
+        deadline = state.deadline if state is not None else None
+        limit = beta if maximizing_player else alpha
+        tablebase_path = state.tablebase.path if state is not None and state.tablebase is not None else None
+        by_key = {move_key(move): move for move in moves[1:]}
+        fail_low = None  # Best score of the moves that failed low, each only bounds its move from above
+        pending = {self.pool.submit(_search_root_move, position, key, depth, deadline, limit, tablebase_path)
+                   for key in by_key}
+        try:
+            while pending and not fails_high(best_score):
+                done, pending = wait(pending, timeout=0.05)
+                for future in done:
+                    key, score, start, nodes = future.result()
+                    if state is not None:
+                        state.nodes += nodes
+                    if score is None:
+                        raise SearchTimeout
+                    # A move that failed low against the bound it started from is no better than a move
+                    # already found, however its bound compares with best_score
+                    if not better(score, start):
+                        if fail_low is None or better(score, fail_low):
+                            fail_low = score
+                    elif better(score, best_score):
+                        best_score, best_move = score, by_key[key]
+                if state is not None and state.out_of_time():
+                    raise SearchTimeout
+        except SearchTimeout:
+            self.stop.value = 1
+            for future in pending:
+                future.cancel()
+            raise
+
+        if pending:
+            # Failed high before every root move came back; let the rest wind down first
+            self.stop.value = 1
+            for future in pending:
+                future.cancel()
+            wait(pending)
+            return best_score, best_move
+
+        # When the whole root failed low, its score bounds every move, including those that failed low
+        failed_low = not better(best_score, alpha if maximizing_player else beta)
+        if failed_low and fail_low is not None and better(fail_low, best_score):
+            best_score = fail_low
+        if tt is not None:
+            color = 1 if maximizing_player else -1
+            low, high = (alpha, beta) if maximizing_player else (-beta, -alpha)
+            tt.store(board.hash, depth, color * best_score, score_bound(color * best_score, low, high),
+                     move_key(best_move))
+        return best_score, best_move
+
+    def close(self):
+        self.stop.value = 1
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+# Set in each helper process of a LazySMPSearch pool
+_helper_generation = None
+_helper_tt = None
+
+
+def _init_smp_helper(table_name, generation):
+    global _helper_generation, _helper_tt
+    _helper_generation = generation
+    _helper_tt = SharedTranspositionTable(name=table_name)
+
+
+class _HelperSearchState(SearchState):
+    def __init__(self, generation, deadline=None):
+        super().__init__(deadline)
+        self.generation = generation
+
+    def out_of_time(self):
+        return _helper_generation.value != self.generation or super().out_of_time()
+
+
+def _smp_helper_search(position, depth, generation, deadline, tablebase_path=None):
+    """
+    Search the position in a helper process until the main search of this generation
+    finishes. Only the entries left in the shared table matter; returns the nodes searched.
+    """
+    board = Board.from_position(position)
+    state = _HelperSearchState(generation, deadline)
+    state.tablebase = tablebase_at(tablebase_path)
+    try:
+        minimax(board, depth, float('-inf'), float('inf'), board.turn == BLUE, _helper_tt, state)
+    except SearchTimeout:
+        pass
+    return state.nodes
+
+
+class LazySMPSearch:
+    """
+    Lazy SMP: helper processes search the same position as this one, every other helper
+    one ply deeper, all through one SharedTranspositionTable. Nothing is split explicitly,
+    the helpers speed the main search up by filling the table ahead of it.
+    """
+
+    def __init__(self, tt, workers=None):
+        self.tt = tt
+        self.helpers = max(1, (workers or os.cpu_count() or 1) - 1)
+        self.generation = multiprocessing.Value('i', 0)
+        self.pool = ProcessPoolExecutor(max_workers=self.helpers, initializer=_init_smp_helper,
+                                        initargs=(tt.name, self.generation))
+
+    def _next_generation(self):
+        with self.generation.get_lock():
+            self.generation.value += 1
+            return self.generation.value
+
+    def search(self, board, depth, tt=None, state=None, alpha=float('-inf'), beta=float('inf')):
+        """
+        Same result as minimax(board, depth, alpha, beta, board.turn == BLUE, self.tt, state);
+        tt is accepted for the iterative_deepening interface, the shared table is always used.
+        The helpers always search the full window.
+        """
+        generation = self._next_generation()
+        position = board.to_position()
+        deadline = state.deadline if state is not None else None
+        tablebase_path = state.tablebase.path if state is not None and state.tablebase is not None else None
+        helpers = [self.pool.submit(_smp_helper_search, position, depth + helper % 2, generation, deadline,
+                                    tablebase_path)
+                   for helper in range(1, self.helpers + 1)]
+        try:
+            return minimax(board, depth, alpha, beta, board.turn == BLUE, self.tt, state)
+        finally:
+            # Stop the helpers; they notice within SearchState.CHECK_INTERVAL nodes
+            self._next_generation()
+            done, _ = wait(helpers)
+            if state is not None:
+                state.nodes += sum(future.result() for future in done)
+
+    def close(self):
+        self._next_generation()
+        self.pool.shutdown(wait=True, cancel_futures=True)
+
+
+class OpeningBook:
+    """
+    Best moves of opening positions keyed by Board.hash, in a file built by book.py.
+    The file is a header and fixed-size entries sorted by key. It is memory-mapped and
+    binary-searched, so only the pages a lookup touches are ever read.
+    """
+    HEADER = struct.Struct('<8sII')  # Magic, format version, number of entries
+    ENTRY = struct.Struct('<QBBHi')  # Position hash, from square, to square, search depth, score
+    MAGIC = b'CHKBOOK\0'
+    VERSION = 1
+    SCORE_LIMIT = 2 ** 31 - 1  # Stands for a forced win, and its negation for a forced loss
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, self.count = self.HEADER.unpack_from(self.data)
+            if (magic != self.MAGIC or version != self.VERSION
+                    or len(self.data) != self.HEADER.size + self.count * self.ENTRY.size):
+                raise ValueError(f"{path} is not an opening book")
+        except (ValueError, struct.error):
+            self.file.close()
+            raise ValueError(f"{path} is not an opening book")
+
+    def __len__(self):
+        return self.count
+
+    def probe(self, key):
+        """
+        Return (from square, to square, depth, score) stored for the position hash key, or None.
+        """
+        data, entry, header = self.data, self.ENTRY, self.HEADER.size
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            entry_key, from_sq, to_sq, depth, score = entry.unpack_from(data, header + middle * entry.size)
+            if entry_key < key:
+                low = middle + 1
+            elif entry_key > key:
+                high = middle
+            else:
+                if abs(score) == self.SCORE_LIMIT:
+                    score = float('inf') if score > 0 else float('-inf')
+                return from_sq, to_sq, depth, score
+        return None
+
+    def lookup(self, board):
+        """
+        (score, move, depth) of the book move for board, as iterative_deepening returns them,
+        or None when the position is not in the book or the stored move is not legal in it.
+        """
+        entry = self.probe(board.hash)
+        if entry is None:
+            return None
+        from_sq, to_sq, depth, score = entry
+        for move in board.get_all_valid_moves(board.turn):
+            if move_key(move) == (from_sq, to_sq):
+                return score, move, depth
+        return None
+
+    # Every entry as (key, (from square, to square, depth, score)), in key order
+    def items(self):
+        for offset in range(self.HEADER.size, len(self.data), self.ENTRY.size):
+            key, from_sq, to_sq, depth, score = self.ENTRY.unpack_from(self.data, offset)
+            yield key, (from_sq, to_sq, depth, score)
+
+    @classmethod
+    def write(cls, path, entries):
+        """
+        Write entries, a dict of position hash -> (from square, to square, depth, score), as a book file.
+        """
+        with open(path, 'wb') as file:
+            file.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(entries)))
+            for key in sorted(entries):
+                from_sq, to_sq, depth, score = entries[key]
+                score = max(-cls.SCORE_LIMIT, min(cls.SCORE_LIMIT, score))
+                file.write(cls.ENTRY.pack(key, from_sq, to_sq, depth, int(score)))
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+# The square on the other side of the board, seen from the other player
+FLIPPED_SQUARES = [(ROWS - 1 - sq // COLS) * COLS + sq % COLS for sq in range(ROWS * COLS)]
+
+
+# Rank of a set of squares among all sets of that many squares, in colex order
+def combination_rank(group):
+    return sum(math.comb(sq, index + 1) for index, sq in enumerate(sorted(group)))
+
+
+class Tablebase:
+    """
+    Game results of every position with at most PIECES pieces, all of them men, and no boxes,
+    in a file built by tablebase.py, as the search plays them: men's moves only and no game
+    clock. Positions with a knight are not covered, tablebase.py does not solve knight moves.
+    Each material (the men of each side) has a table of one byte per position: the result
+    for the player to move in the top two bits and the plies to the end of the game in the
+    rest. A material and the one with the sides swapped share a table, the rules being the
+    same for both turned upside down. The file is memory-mapped.
+    """
+    HEADER = struct.Struct('<8sII')  # Magic, format version, number of tables
+    TABLE = struct.Struct('<8sQQ')  # Material name, offset of its table, positions in it
+    MAGIC = b'CHKTBASE'
+    VERSION = 1
+    PIECES = 3
+    WIN, LOSS, DRAW = 1, 2, 3
+    MAX_DISTANCE = 63
+    WIN_SCORE = 1000000  # Score of winning right away; a win in n plies scores WIN_SCORE - n
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'rb')
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, count = self.HEADER.unpack_from(self.data)
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError
+            self.tables = {}
+            for index in range(count):
+                name, offset, size = self.TABLE.unpack_from(self.data, self.HEADER.size + index * self.TABLE.size)
+                if offset + size > len(self.data):
+                    raise ValueError
+                self.tables[name.rstrip(b'\0').decode()] = (offset, size)
+        except (ValueError, struct.error, UnicodeDecodeError):
+            self.file.close()
+            raise ValueError(f"{path} is not a tablebase")
+
+    @staticmethod
+    def material(red_men, red_knight, blue_men, blue_knight):
+        """
+        Name of a material, e.g. 'mm-n' for two red men against the blue knight.
+        """
+        return 'm' * red_men + 'n' * red_knight + '-' + 'm' * blue_men + 'n' * blue_knight
+
+    @staticmethod
+    def table_size(red_men, red_knight, blue_men, blue_knight):
+        return 2 * math.prod(math.comb(ROWS * COLS, count) for count in (red_men, red_knight, blue_men, blue_knight))
+
+    @staticmethod
+    def index(red_men, red_knight, blue_men, blue_knight, turn):
+        """
+        Position of a placement in its material's table; every argument but turn is a tuple of squares.
+        """
+        index = 0
+        for group in (red_men, red_knight, blue_men, blue_knight):
+            index = index * math.comb(ROWS * COLS, len(group)) + combination_rank(group)
+        return index * 2 + (turn == BLUE)
+
+    def probe_result(self, board):
+        """
+        (result, distance) for the player to move, or None when the position is not covered.
+        A covered position that check_winner already decided is answered without the tables.
+        """
+        red, blue = board.red_mask, board.blue_mask
+        if (red | blue).bit_count() > self.PIECES or board.king_mask or board.knight_mask:
+            return None
+        if board.red_box_mask or board.blue_box_mask:
+            return None
+        if board.winner:
+            if board.winner == "Tie":
+                return self.DRAW, 0
+            return (self.WIN if board.winner == ("Blue" if board.turn == BLUE else "Red") else self.LOSS), 0
+        knights, turn = board.knight_mask, board.turn
+        groups = (tuple(squares(red & ~knights)), tuple(squares(red & knights)),
+                  tuple(squares(blue & ~knights)), tuple(squares(blue & knights)))
+        table = self.tables.get(self.material(*map(len, groups)))
+        if table is None:
+            # Only one of a material and its mirror image is stored: swap the sides and turn the board over
+            groups = tuple(tuple(FLIPPED_SQUARES[sq] for sq in group) for group in groups[2:] + groups[:2])
+            turn = RED if turn == BLUE else BLUE
+            table = self.tables.get(self.material(*map(len, groups)))
+            if table is None:
+                return None
+        value = self.data[table[0] + self.index(*groups, turn)]
+        if not value:
+            return None
+        return value >> 6, value & self.MAX_DISTANCE
+
+    def probe(self, board, ply=0):
+        """
+        Score of the position for the player to move, as negamax counts it, or None when it is not covered.
+        The plies to the end count from the root of the search, ply plies above board, so a
+        quicker win scores higher wherever in the tree it is found.
+        """
+        found = self.probe_result(board)
+        if found is None:
+            return None
+        result, distance = found
+        if result == self.WIN:
+            return self.WIN_SCORE - ply - distance
+        if result == self.LOSS:
+            return ply + distance - self.WIN_SCORE
+        return 0
+
+    @classmethod
+    def write(cls, path, tables):
+        """
+        Write tables, a dict of material name -> bytes of its table, as a tablebase file.
+        """
+        offset = cls.HEADER.size + len(tables) * cls.TABLE.size
+        with open(path, 'wb') as file:
+            file.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, len(tables)))
+            for name, table in tables.items():
+                file.write(cls.TABLE.pack(name.encode(), offset, len(table)))
+                offset += len(table)
+            for table in tables.values():
+                file.write(table)
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+
+# Tablebases opened in this process by path, so worker processes open each file once
+_open_tablebases = {}
+
+
+def tablebase_at(path):
+    if path is None:
+        return None
+    if path not in _open_tablebases:
+        _open_tablebases[path] = Tablebase(path)
+    return _open_tablebases[path]
+
+
+ASPIRATION_WINDOW = 5  # Evaluation points either side of the last depth's score, 0 to search full windows
+
+
+def time_budget_for(board, moves_left=20, minimum=0.2, maximum=5.0):
+    """
+    Seconds to think about one move, sharing the remaining game clock over moves_left moves.
+    """
+    return max(minimum, min(maximum, board.remaining_time() / moves_left))
+
+
+def iterative_deepening(board, time_budget=None, max_depth=AI_MAX_DEPTH, tt=None, state=None, parallel=None,
+                        book=None, tablebase=None):
+    """
+    Search depth 1, 2, 3... until the time budget runs out and return
+    (score, best_move, depth) from the deepest search that finished.
+    Depth 1 always finishes so there is a move to play. Each depth after the first is
+    searched in an aspiration window around the score of the one before. With a RootParallelSearch
+    or LazySMPSearch as parallel, each depth is searched across its worker processes.
+    A position found in the OpeningBook book is answered from it without searching, and
+    the search stops at the positions the Tablebase tablebase covers.
+    """
+    if time_budget is None:
+        time_budget = time_budget_for(board)
+    if tt is None:
+        tt = TranspositionTable()
+    if state is None:
+        state = SearchState()
+    if tablebase is not None:
+        state.tablebase = tablebase
+
+    start = time.time()
+    found = book.lookup(board) if book is not None else None
+    if found is not None:
+        if state.stats is not None:
+            state.stats.finish(board, found, state.nodes, time.time() - start, from_book=True)
+        return found
+
+    maximizing_player = board.turn == BLUE
+    best = (evaluate(board), None, 0)
+    for depth in range(1, max_depth + 1):
+        state.depth = depth
+        # Aspiration window around the last score; the side that fails opens up fully
+        if depth > 1 and ASPIRATION_WINDOW:
+            alpha, beta = best[0] - ASPIRATION_WINDOW, best[0] + ASPIRATION_WINDOW
+        else:
+            alpha, beta = float('-inf'), float('inf')
+        try:
+            while True:
+                if parallel is not None:
+                    score, move = parallel.search(board, depth, tt, state, alpha, beta)
+                else:
+                    score, move = minimax(board, depth, alpha, beta, maximizing_player, tt, state)
+                if score <= alpha and alpha != float('-inf'):
+                    alpha = float('-inf')
+                elif score >= beta and beta != float('inf'):
+                    beta = float('inf')
+                else:
+                    break
+        except SearchTimeout:
+            break
+        best = (score, move, depth)
+        state.deadline = start + time_budget
+        if state.stats is not None:
+            state.stats.iterations.append((depth, score, state.nodes, round(time.time() - start, 4)))
+
+        # Stop on a forced result, or when the next depth would not finish in time
+        if move is None or score in (float('inf'), float('-inf')):
+            break
+        if state.tablebase is not None and state.tablebase.probe_result(board) is not None:
+            break  # Every move was scored from the tablebase, deeper searches find the same
+        if time.time() - start > time_budget / 2:
+            break
+
+    if state.stats is not None:
+        state.stats.finish(board, best, state.nodes, time.time() - start)
+    return best
+
+
+def analyse(board, time_budget=None, max_depth=AI_MAX_DEPTH, tt=None, parallel=None, log=None, book=None,
+            tablebase=None):
+    """
+    iterative_deepening with SearchStats: returns (score, best_move, depth, stats) and
+    appends the stats to the JSON lines file log, if given.
+    """
+    stats = SearchStats()
+    score, move, depth = iterative_deepening(board, time_budget, max_depth, tt, SearchState(stats=stats), parallel,
+                                             book, tablebase)
+    if log is not None:
+        stats.write(log)
+    return score, move, depth, stats
+
+
+def translate_move(board, move):
+    """
+    Rebuild a move found on a copy of the board with the pieces of this board.
+    """
+    piece, (row, col), skipped = move
+    if piece is not None:
+        piece = board.pieces[square(piece.row, piece.col)]
+    return piece, (row, col), [board.pieces[square(captured.row, captured.col)] for captured in skipped]
+
+
+class SearchJob:
+    """
+    Computer move searched on a worker thread, so the game loop keeps drawing and
+    handling events while the engine thinks. The search runs on a copy of the board;
+    state.depth and state.nodes show its progress. With a stats_log the search collects
+    SearchStats and appends them to that JSON lines file when it finishes. With a book,
+    positions in the OpeningBook are answered without a search, and with a tablebase the
+    search stops at the positions the Tablebase covers. on_done is called on the search
+    thread once the job is done, for a game loop that sleeps until then.
+    """
+
+    def __init__(self, board, time_budget=None, tt=None, parallel=None, stats_log=None, book=None, tablebase=None,
+                 on_done=None):
+        self.snapshot = board.copy()
+        self.time_budget = time_budget_for(board) if time_budget is None else time_budget
+        self.tt = tt
+        self.parallel = parallel
+        self.stats_log = stats_log
+        self.book = book
+        self.on_done = on_done
+        self.state = SearchState(stats=SearchStats() if stats_log is not None else None, tablebase=tablebase)
+        self.result = None
+        self.done = False
+        self.elapsed = None  # Seconds the search took, once done
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.result = iterative_deepening(self.snapshot, self.time_budget, tt=self.tt, state=self.state,
+                                              parallel=self.parallel, book=self.book)
+            if self.stats_log is not None:
+                self.state.stats.write(self.stats_log)
+        finally:
+            self.elapsed = time.perf_counter() - start
+            self.done = True
+            if self.on_done is not None:
+                self.on_done()
+
+    def cancel(self):
+        self.state.stopped = True
+
+    # Best move for the board the job was started from, or None if there is none
+    def best_move(self, board):
+        if self.result is None or self.result[1] is None:
+            return None
+        return translate_move(board, self.result[1])
+
+
+def place_enemy_knight(board):
+    """
+    Place the enemy knight during the setup phase.
+    """
+    if board.turn == RED and not board.blue_knight_set:
+        for row in range(ROWS - 3, ROWS):
+            for col in range(COLS):
+                if board.is_empty(row, col):
+                    board._place(board.blue_knight, row, col)
+                    board.blue_knight_set = True
+                    board._switch_turn()
+                    return
+    elif board.turn == BLUE and not board.red_knight_set:
+        for row in range(3):
+            for col in range(COLS):
+                if board.is_empty(row, col):
+                    board._place(board.red_knight, row, col)
+                    board.red_knight_set = True
+                    board._switch_turn()
+                    board.setup_phase = False
+                    return
@@ -0,0 +1,404 @@
+"""
+Pygame front end shared by the game scripts: window setup and drawing of an engine Board.
+"""
+import csv
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pygame
+
+from engine import ROWS, COLS, RED, BLUE, SPECIAL_RED, SPECIAL_BLUE, ALL_SQUARES, ROW_MASKS, square, squares
+
+PANEL_WIDTH = 400
+FRAME_RATE = 60
+EVENT_DRIVEN = True  # Sleep until something happens instead of drawing FRAME_RATE frames a second
+THINKING_INTERVAL = 100  # Milliseconds between redraws of the search progress while the computer thinks
+SEARCH_DONE = pygame.event.custom_type()  # Posted by the search thread to wake the event-driven loop
+PROFILE_OVERLAY = False  # Show frame timings at the bottom of the panel; F3 toggles them while playing
+PROFILE_CSV = None  # CSV file the timings of every frame are written to when the game closes, or None
+
+# Colors
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+GREY = (128, 128, 128)
+GREEN = (0, 255, 0)
+YELLOW = (255, 255, 0)
+HIGHLIGHT = (173, 216, 230)  # Light blue for highlighting valid cells
+LIGHT_RED = (255, 182, 193)
+LIGHT_BLUE = (173, 216, 230)
+
+
+# Open the game window; only the front ends call this, never on import
+def create_window(board_size, panel_width=PANEL_WIDTH):
+    pygame.init()
+    win = pygame.display.set_mode((board_size + panel_width, board_size))
+    pygame.display.set_caption('12x12 Checkers Game')
+    return win
+
+
+# Wait for the next frame and return its events. In the event-driven mode the loop sleeps until
+# an event, the next second of the game clock or, while busy (the computer thinks), the next progress redraw
+def next_events(board, clock, busy=False):
+    if not EVENT_DRIVEN:
+        clock.tick(FRAME_RATE)
+        return pygame.event.get()
+
+    if busy:
+        event = pygame.event.wait(THINKING_INTERVAL)
+    elif board.winner:
+        event = pygame.event.wait()  # The clock has stopped
+    else:
+        event = pygame.event.wait(int(board.remaining_time() % 1 * 1000) + 1)
+    clock.tick()
+    events = [] if event.type == pygame.NOEVENT else [event]
+    return events + pygame.event.get()
+
+
+# Wake the event-driven loop, from any thread
+def post_search_done():
+    pygame.event.post(pygame.event.Event(SEARCH_DONE))
+
+
+class FrameProfiler:
+    """
+    Times the parts of every frame of a game loop. A frame runs from begin_frame to
+    end_frame; section() and add() put the time of a part into the current frame, 'ai'
+    being the think time of a computer move picked up in it. The last HISTORY frames
+    are kept for the overlay, every frame only when they are to be written to a CSV file.
+    """
+    SECTIONS = ('frame', 'events', 'check_winner', 'draw', 'panel', 'ai')  # The panel is drawn within 'draw'
+    HISTORY = 120
+    BUCKETS = (2, 4, 8, 16, 33, 66)  # Upper bounds in ms of the frame time histogram bars, the last bar is slower
+
+    def __init__(self, visible=PROFILE_OVERLAY, csv_path=PROFILE_CSV):
+        self.visible = visible
+        self.csv_path = csv_path
+        self.frames = [] if csv_path else deque(maxlen=self.HISTORY)  # (seconds since start, {section: seconds})
+        self.times = {}
+        self.start = self.frame_start = time.perf_counter()
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter()
+        self.times = {}
+
+    def end_frame(self):
+        self.add('frame', time.perf_counter() - self.frame_start)
+        self.frames.append((self.frame_start - self.start, self.times))
+
+    def add(self, name, seconds):
+        self.times[name] = self.times.get(name, 0.0) + seconds
+
+    @contextmanager
+    def section(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    # {section: (average ms, most ms)} over the last HISTORY frames, for the sections they timed
+    def summary(self):
+        recent = list(self.frames)[-self.HISTORY:]
+        summary = {}
+        for name in self.SECTIONS:
+            values = [times[name] * 1000 for _, times in recent if name in times]
+            if values:
+                summary[name] = (sum(values) / len(values), max(values))
+        return summary
+
+    # Frames of the last HISTORY that took up to each of BUCKETS ms, and the frames slower than all
+    def histogram(self):
+        counts = [0] * (len(self.BUCKETS) + 1)
+        for _, times in list(self.frames)[-self.HISTORY:]:
+            ms = times['frame'] * 1000
+            counts[next((i for i, bound in enumerate(self.BUCKETS) if ms <= bound), len(self.BUCKETS))] += 1
+        return counts
+
+    def write_csv(self, path=None):
+        path = path or self.csv_path
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['time'] + [f"{name}_ms" for name in self.SECTIONS])
+            for at, times in self.frames:
+                writer.writerow([f"{at:.3f}"] + [f"{times[name] * 1000:.3f}" if name in times else ''
+                                                 for name in self.SECTIONS])
+
+    # Write the CSV file if there is one to write, when the game closes
+    def close(self):
+        if self.csv_path:
+            self.write_csv()
+
+
+class BoardView:
+    """
+    Draws a Board and its side panel on a window and maps clicks back to squares.
+    """
+    PADDING = 15
+    OUTLINE = 2
+    FONT_SIZE = 40
+    SPRITE_SCALE = 4  # Pieces are drawn this many times larger and scaled down, which smooths their edges
+    TEXT_CACHE_SIZE = 64  # Rendered panel texts kept; the timer and node count make new ones all the time
+
+    def __init__(self, win, board_size, panel_width=PANEL_WIDTH):
+        self.win = win
+        self.board_width = board_size
+        self.panel_width = panel_width
+        self.height = board_size
+        self.square_size = board_size // ROWS
+        self.background = self.render_background()
+        # One picture of every kind of piece on every square color, blitted instead of drawing its circles
+        self.sprites = {}
+        for ground in (WHITE, BLACK):
+            for color in (RED, BLUE, SPECIAL_RED, SPECIAL_BLUE):
+                for king in (False, True):
+                    for knight in (False, True):
+                        self.sprites[ground, color, king, knight] = self.render_piece(ground, color, king, knight)
+        self.font = pygame.font.SysFont(None, self.FONT_SIZE)  # Looking a font up is slow, do it once
+        self.texts = {}
+        self.profile_font = None
+        self.profiler = None  # A FrameProfiler to time draw_panel with, if any
+        self.dirty_rects = []
+        self.button = None
+        self.invalidate()
+
+    # Board square under a window position, or None off the squares
+    def square_at(self, pos):
+        x, y = pos
+        row, col = y // self.square_size, x // self.square_size
+        # The squares can leave a strip of a few pixels below and right of the board
+        if x >= self.board_width or row >= ROWS or col >= COLS:
+            return None
+        return row, col
+
+    # Forget what is on the window, so the next draw repaints all of it (after the window was covered)
+    def invalidate(self):
+        self.shown = None
+        self.panel_shown = None
+
+    # Draw what changed since the last draw and return the panel button (box or reset), if any
+    def draw(self, board, search_job=None):
+        layers = self.layers(board)
+        if self.shown is None:
+            dirty = ALL_SQUARES
+            self.dirty_rects.append(self.win.get_rect())
+        else:
+            dirty = 0
+            for shown, layer in zip(self.shown, layers):
+                dirty |= shown ^ layer
+        self.shown = layers
+        for sq in squares(dirty):
+            self.draw_square(board, sq, layers)
+
+        panel = self.panel_state(board, search_job)
+        if panel != self.panel_shown:
+            self.panel_shown = panel
+            if self.profiler is not None:
+                with self.profiler.section('panel'):
+                    self.button = self.draw_panel(board, search_job)
+            else:
+                self.button = self.draw_panel(board, search_job)
+            self.dirty_rects.append(pygame.Rect(self.board_width, 0, self.panel_width, self.height))
+        return self.button
+
+    # Show the parts of the window drawn since the last call
+    def update_display(self):
+        if self.dirty_rects:
+            pygame.display.update(self.dirty_rects)
+            self.dirty_rects = []
+
+    # Bitboards of everything drawn on the squares; a square is redrawn when its bit changes in any of them
+    def layers(self, board):
+        valid_moves = 0
+        for row, col in board.valid_moves:
+            valid_moves |= 1 << square(row, col)
+        return (board.red_mask, board.blue_mask, board.king_mask, board.knight_mask,
+                board.red_box_mask, board.blue_box_mask, self.setup_cells(board), valid_moves)
+
+    # The checkerboard, drawn once and copied from for every square that changes
+    def render_background(self):
+        size = self.square_size
+        background = pygame.Surface((self.board_width, self.height)).convert()
+        background.fill(BLACK)
+        for row in range(ROWS):
+            for col in range(row % 2, COLS, 2):
+                pygame.draw.rect(background, WHITE, (row * size, col * size, size, size))
+        return background
+
+    # Redraw one square with everything on it
+    def draw_square(self, board, sq, layers):
+        _, _, _, _, red_boxes, blue_boxes, setup_cells, valid_moves = layers
+        position = divmod(sq, COLS)
+        rect = self.square_rect(position)
+        self.win.blit(self.background, rect, rect)
+        if red_boxes >> sq & 1:
+            self.fill_square(position, LIGHT_RED)
+        elif blue_boxes >> sq & 1:
+            self.fill_square(position, LIGHT_BLUE)
+        if board.pieces[sq] is not None:
+            self.draw_piece(board.pieces[sq])
+        if setup_cells >> sq & 1:
+            self.fill_square(position, HIGHLIGHT)
+        if valid_moves >> sq & 1:
+            pygame.draw.circle(self.win, GREEN, rect.center, 15)
+        self.dirty_rects.append(rect)
+
+    def square_rect(self, position):
+        row, col = position
+        size = self.square_size
+        return pygame.Rect(col * size, row * size, size, size)
+
+    def fill_square(self, position, color):
+        pygame.draw.rect(self.win, color, self.square_rect(position))
+
+    # Draw a piece on its square
+    def draw_piece(self, piece):
+        ground = WHITE if (piece.row + piece.col) % 2 == 0 else BLACK  # The square color, as in render_background
+        key = (ground, piece.color, piece.king, piece.knight)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            sprite = self.sprites[key] = self.render_piece(*key)
+        self.win.blit(sprite, self.square_rect((piece.row, piece.col)))
+
+    # A square with a piece on it, smoothed by drawing it large and scaling it down.
+    # The square is opaque, so blitting it is a plain copy
+    def render_piece(self, ground, color, king, knight):
+        scale = self.SPRITE_SCALE
+        size = self.square_size * scale
+        center = (size // 2, size // 2)
+        radius = (self.square_size // 2 - self.PADDING) * scale
+        surface = pygame.Surface((size, size))
+        surface.fill(ground)
+        pygame.draw.circle(surface, GREY, center, radius + self.OUTLINE * scale)
+        pygame.draw.circle(surface, color, center, radius)
+        if king:
+            pygame.draw.circle(surface, YELLOW, center, radius // 2)
+        if knight:
+            pygame.draw.circle(surface, GREEN, center, radius // 3)
+        return pygame.transform.smoothscale(surface, (self.square_size, self.square_size)).convert()
+
+    # Empty cells highlighted during the setup phase, where the player to move may place a knight
+    def setup_cells(self, board):
+        if not board.setup_phase:
+            return 0
+        if board.turn == RED and not board.blue_knight_set:
+            rows = range(ROWS - 3, ROWS)
+        elif board.turn == BLUE and not board.red_knight_set:
+            rows = range(3)
+        else:
+            return 0
+        cells = 0
+        for row in rows:
+            cells |= ROW_MASKS[row]
+        return cells & ~board.occupied_mask()
+
+    # Everything the panel shows; it is only redrawn when this changes
+    def panel_state(self, board, search_job=None):
+        thinking = None
+        if not board.setup_phase and search_job is not None and not search_job.done:
+            thinking = (search_job.state.depth, search_job.state.nodes)
+        clock = board.winner or int(board.remaining_time())
+        boxes = board.red_boxes if board.turn == RED else board.blue_boxes
+        return (board.turn, board.red_captures, board.blue_captures, board.red_points, board.blue_points,
+                board.setup_phase, thinking, clock, any(turns > 0 for _, turns in boxes))
+
+    # Panel text rendered once and reused while the panel shows it; the cache drops the least recently shown
+    def text(self, string):
+        surface = self.texts.pop(string, None)
+        if surface is None:
+            if len(self.texts) >= self.TEXT_CACHE_SIZE:
+                del self.texts[next(iter(self.texts))]  # Drop the least recently shown
+            surface = self.font.render(string, True, BLACK)
+        self.texts[string] = surface  # Most recently shown last
+        return surface
+
+    # Draw the panel displaying game information
+    def draw_panel(self, board, search_job=None):
+        win = self.win
+        panel_x = self.board_width
+        panel_width = self.panel_width
+        pygame.draw.rect(win, GREY, (panel_x, 0, panel_width, self.height))
+
+        turn_text = self.text("Turn:")
+        win.blit(turn_text, (panel_x + 20, 20))
+
+        color_rect = pygame.Rect(panel_x + 20, 70, panel_width - 40, 50)
+        pygame.draw.rect(win, board.turn, color_rect)
+
+        red_captures_text = self.text(f"Red Captures: {board.red_captures}")
+        blue_captures_text = self.text(f"Blue Captures: {board.blue_captures}")
+        win.blit(red_captures_text, (panel_x + 20, 140))
+        win.blit(blue_captures_text, (panel_x + 20, 200))
+
+        red_points_text = self.text(f"Red Points: {board.red_points}")
+        blue_points_text = self.text(f"Blue Points: {board.blue_points}")
+        win.blit(red_points_text, (panel_x + 20, 260))
+        win.blit(blue_points_text, (panel_x + 20, 320))
+
+        if board.setup_phase:
+            if board.turn == RED:
+                setup_text = self.text("Red, place Blue's knight")
+            else:
+                setup_text = self.text("Blue, place Red's knight")
+            win.blit(setup_text, (panel_x + 20, 380))
+        elif search_job is not None and not search_job.done:
+            state = search_job.state
+            thinking_text = self.text(f"Thinking... depth {state.depth}, {state.nodes} nodes")
+            win.blit(thinking_text, (panel_x + 20, 380))
+
+        # Display remaining time or winner
+        if not board.winner:
+            remaining_time = int(board.remaining_time())
+            minutes = int(remaining_time // 60)
+            seconds = int(remaining_time % 60)
+            time_text = self.text(f"Time: {minutes:02}:{seconds:02}")
+            win.blit(time_text, (panel_x + 20, 440))
+        else:
+            winner_text = self.text(f"{board.winner} Wins!")
+            win.blit(winner_text, (panel_x + 20, 440))
+
+        # Display box button or reset button
+        if not board.winner:
+            if (board.turn == RED and not any(turns > 0 for _, turns in board.red_boxes)) or (board.turn == BLUE and not any(turns > 0 for _, turns in board.blue_boxes)):
+                box_button = pygame.Rect(panel_x + 20, 500, panel_width - 40, 50)
+                pygame.draw.rect(win, GREEN, box_button)
+                box_text = self.text("Put Box")
+                win.blit(box_text, (panel_x + 40, 510))
+                return box_button
+        else:
+            reset_button = pygame.Rect(panel_x + 20, 500, panel_width - 40, 50)
+            pygame.draw.rect(win, GREEN, reset_button)
+            reset_text = self.text("Reset")
+            win.blit(reset_text, (panel_x + 40, 510))
+            return reset_button
+
+        return None
+
+    # Draw the timings of a FrameProfiler below the panel buttons: the average and slowest ms
+    # of each section over the last frames, and a histogram of their frame times
+    def draw_profile(self, profiler):
+        if self.profile_font is None:
+            self.profile_font = pygame.font.SysFont(None, 20)
+        font = self.profile_font
+        rect = pygame.Rect(self.board_width + 20, 565, self.panel_width - 40, self.height - 570)
+        pygame.draw.rect(self.win, BLACK, rect)
+        self.dirty_rects.append(rect)
+
+        summary = profiler.summary()
+        column = rect.width // 2
+        for i, name in enumerate(profiler.SECTIONS):
+            if name in summary:
+                text = f"{name} {summary[name][0]:.1f}/{summary[name][1]:.1f} ms"
+                self.win.blit(font.render(text, True, WHITE), (rect.x + 5 + i % 2 * column, rect.y + 5 + i // 2 * 16))
+
+        counts = profiler.histogram()
+        labels = [f"<{bound}" for bound in profiler.BUCKETS] + [f">{profiler.BUCKETS[-1]}"]
+        top = rect.y + 5 + (len(profiler.SECTIONS) + 1) // 2 * 16
+        bottom = rect.bottom - 16
+        width = rect.width // len(counts)
+        most = max(counts) or 1
+        for i, (count, label) in enumerate(zip(counts, labels)):
+            x = rect.x + i * width
+            height = (bottom - top) * count // most
+            pygame.draw.rect(self.win, GREEN, (x + 4, bottom - height, width - 8, height))
+            self.win.blit(font.render(label, True, WHITE), (x + 4, bottom + 2))
@@ -0,0 +1,60 @@
+"""
+Count the nodes the search visits on a fixed suite of positions, to measure a change
+to move ordering or pruning. A change that only orders moves better must leave every
+score as it was and lower the node counts.
+
+Each position is searched twice: by iterative deepening from depth 1 up to --depth
+with a transposition table, the way the computer player searches, and once to
+--plain-depth without a table. The clock is not used, so the counts repeat exactly.
+
+    python nodes.py
+    python nodes.py --file positions.txt --depth 5 --plain-depth 4
+
+positions.txt is the suite: 16 positions from seeded random play, with Blue to move.
+"""
+import argparse
+import time
+
+from engine import Board, TranspositionTable, SearchState, BLUE, minimax
+from perft import load_positions
+
+
+# Iterative deepening from depth 1 to depth with one table and state, as (score, nodes)
+def deepening_nodes(board, depth):
+    tt, state = TranspositionTable(), SearchState()
+    score = None
+    for iteration in range(1, depth + 1):
+        score, _ = minimax(board, iteration, float('-inf'), float('inf'), board.turn == BLUE, tt, state)
+    return score, state.nodes
+
+
+# One search to depth without a table, as (score, nodes)
+def plain_nodes(board, depth):
+    state = SearchState()
+    score, _ = minimax(board, depth, float('-inf'), float('inf'), board.turn == BLUE, None, state)
+    return score, state.nodes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count the nodes searched on a suite of positions.")
+    parser.add_argument('--file', default='positions.txt', help="positions in Board.to_text form, one per line")
+    parser.add_argument('--depth', type=int, default=4, help="deepest iteration of iterative deepening")
+    parser.add_argument('--plain-depth', type=int, default=4, help="depth of the search without a table")
+    args = parser.parse_args()
+
+    totals = [0, 0]
+    start = time.perf_counter()
+    for number, text in enumerate(load_positions(args.file), 1):
+        deep_score, deep_nodes = deepening_nodes(Board.from_text(text), args.depth)
+        plain_score, plain = plain_nodes(Board.from_text(text), args.plain_depth)
+        totals[0] += deep_nodes
+        totals[1] += plain
+        print(f"position {number}: deepening {deep_nodes} nodes, score {deep_score}; "
+              f"plain {plain} nodes, score {plain_score}")
+
+    print(f"total: deepening 1..{args.depth} {totals[0]} nodes, plain depth {args.plain_depth} {totals[1]} nodes, "
+          f"{time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
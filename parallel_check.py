@@ -0,0 +1,126 @@
+"""
+Regression check of RootParallelSearch against the serial search.
+
+Random positions are searched to a fixed depth by minimax and by RootParallelSearch.
+The parallel search must find the same root score, and the move it picks must be worth
+that score: searching the position after it with minimax must give the score again.
+A different move of the same worth is fine, the order the workers finish in decides
+between equal moves. Each position is searched again in aspiration windows around and
+beside the score, where a score outside the window only has to bound the true one.
+The root entry the parallel search stores in the transposition table is checked too.
+
+    python parallel_check.py
+    python parallel_check.py --positions 240 --depth 3 --workers 2
+"""
+import argparse
+import random
+import sys
+import time
+
+from engine import (
+    Board, TranspositionTable, BLUE, EXACT, LOWER_BOUND, UPPER_BOUND, ASPIRATION_WINDOW, RootParallelSearch, minimax,
+    move_key,
+)
+from perft import setup_placements
+
+
+def random_positions(count, max_plies, rng):
+    """
+    Positions reached by random knight placements and random moves, with the game not decided.
+    """
+    positions = []
+    while len(positions) < count:
+        board = Board()
+        board.select(*rng.choice(setup_placements(board)))
+        board.select(*rng.choice(setup_placements(board)))
+        for _ in range(rng.randrange(max_plies)):
+            board.start_time = time.time()
+            moves = board.get_all_valid_moves(board.turn)
+            if not moves or board.winner:
+                break
+            board.make_move(rng.choice(moves))
+        board.start_time = time.time()
+        if not board.check_winner() and len(board.get_all_valid_moves(board.turn)) > 1:
+            positions.append(board)
+    return positions
+
+
+# Score of the position after move, as the root search scores it
+def move_score(board, move, depth):
+    token = board.make_move(move)
+    try:
+        score, _ = minimax(board, depth - 1, float('-inf'), float('inf'), board.turn == BLUE, ply=1)
+    finally:
+        board.unmake_move(token)
+    return score
+
+
+# Whether score, found with the window (alpha, beta), is right about the true score
+def bounds(score, alpha, beta, true_score):
+    if score >= beta:
+        return true_score >= score
+    if score <= alpha:
+        return true_score <= score
+    return true_score == score
+
+
+def check(board, depth, parallel):
+    """
+    A description of how the parallel search went wrong on board, or None if it did not.
+    """
+    serial_score, _ = minimax(board, depth, float('-inf'), float('inf'), board.turn == BLUE)
+    windows = [(float('-inf'), float('inf'))] + [
+        (serial_score + offset - ASPIRATION_WINDOW, serial_score + offset + ASPIRATION_WINDOW)
+        for offset in (-2 * ASPIRATION_WINDOW, 0, 2 * ASPIRATION_WINDOW)]
+    color = 1 if board.turn == BLUE else -1
+    for alpha, beta in windows:
+        tt = TranspositionTable()
+        score, move = parallel.search(board, depth, tt, None, alpha, beta)
+        if not bounds(score, alpha, beta, serial_score):
+            return f"score {score} in window ({alpha}, {beta}), serial search {serial_score}"
+        if alpha < score < beta:
+            worth = move_score(board, move, depth)
+            if worth != serial_score:
+                return f"move {move_key(move)} is worth {worth}, not {serial_score}"
+
+        # The stored root entry is for the side to move
+        entry = tt.probe(board.hash)
+        if entry is not None and entry[1] == depth:
+            entry_score, bound = color * entry[2], entry[3]
+            right = {EXACT: entry_score == serial_score,
+                     LOWER_BOUND: color * serial_score >= color * entry_score,
+                     UPPER_BOUND: color * serial_score <= color * entry_score}[bound]
+            if not right:
+                return f"root entry {entry_score} with bound {bound}, serial search {serial_score}"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare RootParallelSearch with the serial minimax.")
+    parser.add_argument('--positions', type=int, default=120, help="random positions to search")
+    parser.add_argument('--depth', type=int, nargs='+', default=[2, 3], help="search depths, one is picked per position")
+    parser.add_argument('--plies', type=int, default=60, help="most random moves played to reach a position")
+    parser.add_argument('--workers', type=int, default=2, help="worker processes of the parallel search")
+    parser.add_argument('--seed', type=int, default=1, help="seed of the random positions")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    parallel = RootParallelSearch(args.workers)
+    failures = 0
+    try:
+        for number, board in enumerate(random_positions(args.positions, args.plies, rng), 1):
+            depth = rng.choice(args.depth)
+            problem = check(board, depth, parallel)
+            if problem is not None:
+                failures += 1
+                print(f"position {number}, depth {depth}: {problem}")
+                print(f"  {board.to_text()}")
+    finally:
+        parallel.close()
+
+    print(f"{args.positions} positions, {failures} wrong")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
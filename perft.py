@@ -0,0 +1,181 @@
+"""
+Perft: walk the whole move tree to a fixed depth and count the positions reached.
+The counts only change when move generation changes, so they double as a regression
+check for get_all_valid_moves, _traverse_forward and _knight_moves, and the
+positions per second as a benchmark for them.
+
+Every move a player can make is counted: men's moves, moves of the player's knight,
+a box on any empty square when the player has none on the board, and the knight
+placements of the setup phase.
+
+    python perft.py 3
+    python perft.py 2 --file positions.txt --divide
+
+A positions file has one Board.to_text position per line; blank lines and lines
+starting with # are skipped.
+"""
+import argparse
+import time
+
+from engine import Board, ROWS, COLS, RED, BLUE, square
+
+
+class PerftCounts:
+    """
+    Positions at the last ply and the kinds of move that reached them.
+    """
+    FIELDS = ('nodes', 'captures', 'multi_jumps', 'knight_moves', 'box_placements', 'scoring_moves',
+              'knight_placements')
+
+    def __init__(self):
+        for field in self.FIELDS:
+            setattr(self, field, 0)
+
+    def __iadd__(self, other):
+        for field in self.FIELDS:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        return self
+
+    def count(self, move):
+        piece, (row, col), skipped = move
+        self.nodes += 1
+        if piece is None:
+            self.box_placements += 1
+            return
+        if skipped:
+            self.captures += 1
+            if len(skipped) > 1:
+                self.multi_jumps += 1
+        if piece.knight:
+            self.knight_moves += 1
+        elif (piece.color == RED and row == ROWS - 1) or (piece.color == BLUE and row == 0):
+            self.scoring_moves += 1
+
+    def __str__(self):
+        return ', '.join(f"{field.replace('_', ' ')} {getattr(self, field)}" for field in self.FIELDS)
+
+
+def game_moves(board):
+    """
+    Every move the player to move can make, as make_move takes them, outside the setup phase.
+    """
+    moves = board.get_all_valid_moves(board.turn)
+
+    knight = board.red_knight if board.turn == RED else board.blue_knight
+    if knight.row >= 0:
+        for position, skipped in board.get_valid_moves(knight).items():
+            moves.append((knight, position, skipped))
+
+    boxes = board.red_boxes if board.turn == RED else board.blue_boxes
+    if not boxes:
+        occupied = board.occupied_mask()
+        for row in range(ROWS):
+            for col in range(COLS):
+                if not (occupied >> square(row, col)) & 1:
+                    moves.append((None, (row, col), []))
+    return moves
+
+
+def setup_placements(board):
+    """
+    Squares where the player to move may place the other side's knight during setup.
+    """
+    rows = range(ROWS - 3, ROWS) if board.turn == RED else range(3)
+    return [(row, col) for row in rows for col in range(COLS) if board.is_empty(row, col)]
+
+
+def perft(board, depth, counts=None):
+    """
+    Count the positions depth moves ahead of board into counts and return it.
+    """
+    if counts is None:
+        counts = PerftCounts()
+    if depth == 0 or board.winner:
+        return counts
+
+    if board.setup_phase:
+        # Knight placement is not a make_move move, play it on a copy
+        for row, col in setup_placements(board):
+            if depth == 1:
+                counts.nodes += 1
+                counts.knight_placements += 1
+            else:
+                child = board.copy()
+                child.select(row, col)
+                perft(child, depth - 1, counts)
+        return counts
+
+    for move in game_moves(board):
+        if depth == 1:
+            counts.count(move)
+        else:
+            token = board.make_move(move)
+            perft(board, depth - 1, counts)
+            board.unmake_move(token)
+    return counts
+
+
+# Perft of each first move, to find which part of the tree changed
+def divide(board, depth):
+    results = []
+    if board.setup_phase:
+        for row, col in setup_placements(board):
+            child = board.copy()
+            child.select(row, col)
+            counts = perft(child, depth - 1)
+            if depth == 1:
+                counts.nodes = counts.knight_placements = 1
+            results.append((f"place knight {row},{col}", counts))
+        return results
+
+    for move in game_moves(board):
+        piece, (row, col), _ = move
+        name = f"box {row},{col}" if piece is None else f"{piece.row},{piece.col} -> {row},{col}"
+        if depth == 1:
+            counts = PerftCounts()
+            counts.count(move)
+        else:
+            token = board.make_move(move)
+            counts = perft(board, depth - 1)
+            board.unmake_move(token)
+        results.append((name, counts))
+    return results
+
+
+def load_positions(path):
+    with open(path) as file:
+        return [line.strip() for line in file if line.strip() and not line.startswith('#')]
+
+
+def run(board, depth, show_divide=False):
+    start = time.perf_counter()
+    if show_divide:
+        counts = PerftCounts()
+        for name, move_counts in divide(board, depth):
+            print(f"  {name}: {move_counts.nodes}")
+            counts += move_counts
+    else:
+        counts = perft(board, depth)
+    elapsed = time.perf_counter() - start
+    print(f"depth {depth}: {counts}")
+    print(f"  {elapsed:.2f}s, {counts.nodes / elapsed if elapsed else 0:.0f} nodes/s")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count the move tree to a fixed depth.")
+    parser.add_argument('depth', type=int, help="plies to search")
+    parser.add_argument('--file', help="positions in Board.to_text form, one per line, instead of the start position")
+    parser.add_argument('--divide', action='store_true', help="show the node count under each first move")
+    args = parser.parse_args()
+
+    if args.file:
+        for text in load_positions(args.file):
+            print(text)
+            run(Board.from_text(text), args.depth, args.divide)
+    else:
+        run(Board(), args.depth, args.divide)
+
+
+if __name__ == "__main__":
+    main()
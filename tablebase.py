@@ -0,0 +1,196 @@
+"""
+Build the endgame tablebase the computer player probes during its search.
+
+Every position with up to Tablebase.PIECES men, no knights and no boxes is solved
+under the rules minimax searches: the player to move makes one of the men's moves
+from get_all_valid_moves, a player without one loses, and the game ends as
+check_winner decides it, without the game clock. So a result is the one the search
+would find, not the one of the real game, where a player may also place a box. Kings
+are left out, the rules never crown a man. Knights are left out too: the search plays
+their captures and the solver does not, so Tablebase does not cover positions with a
+knight. Every move of a man takes it forward, so positions are solved by recursing
+into the positions after each move with no cycles to break.
+
+Only one of a material and its mirror image is solved, Tablebase reads the other one
+from it. With three pieces, every capture or point ends the game: one piece each is a tie and
+a side without pieces loses. So the points and captures so far do not change a result
+and the tables leave them out.
+
+    python tablebase.py
+    python tablebase.py --material m-mm --output small.tb
+"""
+import argparse
+import itertools
+import sys
+import time
+
+from engine import Board, Piece, Tablebase, ROWS, COLS, RED, BLUE, AI_TABLEBASE
+
+SQUARES = range(ROWS * COLS)
+
+
+def materials(pieces=Tablebase.PIECES):
+    """
+    Names of every material of pieces men that check_winner has not already decided,
+    leaving out the mirror image (sides swapped) of every material already in the list.
+    """
+    names = []
+    for red, blue in itertools.product(range(pieces + 1), repeat=2):
+        if red + blue == pieces and red and blue and not red == blue == 1:
+            if Tablebase.material(blue, 0, red, 0) not in names:
+                names.append(Tablebase.material(red, 0, blue, 0))
+    return names
+
+
+def parse_material(name):
+    red, blue = name.split('-')
+    return red.count('m'), red.count('n'), blue.count('m'), blue.count('n')
+
+
+class MaterialSolver:
+    """
+    Solves every position of one material, using a Board for the move generation.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = parse_material(name)
+        self.values = bytearray(Tablebase.table_size(*self.counts))
+        self.board = Board()
+        self.board.setup_phase = False
+        self.board.pieces = [None] * (ROWS * COLS)
+        self.board.red_mask = self.board.blue_mask = self.board.king_mask = self.board.knight_mask = 0
+        # The pieces of each group of a placement: red men, red knight, blue men, blue knight
+        self.pieces = ([Piece(-1, -1, RED) for _ in range(self.counts[0])], [self.board.red_knight],
+                       [Piece(-1, -1, BLUE) for _ in range(self.counts[2])], [self.board.blue_knight])
+
+    # Put the pieces straight on the bitboards; move generation needs no hash
+    def _setup(self, groups, turn):
+        board = self.board
+        masks = [0, 0, 0, 0]
+        for kind, (pieces, group) in enumerate(zip(self.pieces, groups)):
+            for piece, sq in zip(pieces, group):
+                masks[kind] |= 1 << sq
+                board.pieces[sq] = piece
+                piece.row, piece.col = divmod(sq, COLS)
+        board.red_mask = masks[0] | masks[1]
+        board.blue_mask = masks[2] | masks[3]
+        board.knight_mask = masks[1] | masks[3]
+        board.turn = turn
+
+    def _clear(self, groups):
+        for group in groups:
+            for sq in group:
+                self.board.pieces[sq] = None
+
+    def moves(self, groups, turn):
+        """
+        Every move of the player to move as (from square, to square, skipped squares).
+        """
+        self._setup(groups, turn)
+        moves = [(piece.row * COLS + piece.col, row * COLS + col, [captured.row * COLS + captured.col
+                                                                   for captured in skipped])
+                 for piece, (row, col), skipped in self.board.get_all_valid_moves(turn)]
+        self._clear(groups)
+        return moves
+
+    def solve(self, groups, turn):
+        """
+        The table byte of a position: its result for the player to move and its distance to the end.
+        """
+        index = Tablebase.index(*groups, turn)
+        if self.values[index]:
+            return self.values[index]
+
+        best = None  # (rank, distance), a higher rank is better for the player to move
+        for from_sq, to_sq, skipped in self.moves(groups, turn):
+            result, distance = self.after(groups, turn, from_sq, to_sq, skipped)
+            # Win soonest, else draw, else lose as late as possible
+            rank = {Tablebase.WIN: (2, -distance), Tablebase.DRAW: (1, 0), Tablebase.LOSS: (0, distance)}[result]
+            if best is None or rank > best[0]:
+                best = (rank, result, distance)
+
+        if best is None:
+            value = Tablebase.LOSS << 6  # No move left
+        elif best[1] == Tablebase.DRAW:
+            value = Tablebase.DRAW << 6  # Draws are stored without a distance
+        else:
+            _, result, distance = best
+            value = (result << 6) | min(distance + 1, Tablebase.MAX_DISTANCE)
+        self.values[index] = value
+        return value
+
+    def after(self, groups, turn, from_sq, to_sq, skipped):
+        """
+        (result, distance) of the position after a move for the player who made it.
+        """
+        scored = to_sq // COLS == (ROWS - 1 if turn == RED else 0) and from_sq in groups[0 if turn == RED else 2]
+        children = []
+        for group in groups:
+            group = [sq for sq in group if sq not in skipped]
+            if from_sq in group:
+                group.remove(from_sq)
+                if not scored:
+                    group.append(to_sq)
+            children.append(tuple(sorted(group)))
+
+        red = len(children[0]) + len(children[1])
+        blue = len(children[2]) + len(children[3])
+        if red == 0 or blue == 0:
+            won = (blue == 0) == (turn == RED)
+            return (Tablebase.WIN if won else Tablebase.LOSS), 0
+        if red == 1 and blue == 1:
+            return Tablebase.DRAW, 0
+
+        value = self.solve(tuple(children), BLUE if turn == RED else RED)
+        result, distance = value >> 6, value & Tablebase.MAX_DISTANCE
+        if result == Tablebase.WIN:
+            return Tablebase.LOSS, distance
+        if result == Tablebase.LOSS:
+            return Tablebase.WIN, distance
+        return Tablebase.DRAW, distance
+
+    def placements(self):
+        red_men, red_knight, blue_men, blue_knight = self.counts
+        for groups in itertools.product(itertools.combinations(SQUARES, red_men),
+                                        itertools.combinations(SQUARES, red_knight),
+                                        itertools.combinations(SQUARES, blue_men),
+                                        itertools.combinations(SQUARES, blue_knight)):
+            occupied = [sq for group in groups for sq in group]
+            if len(set(occupied)) == len(occupied):
+                yield groups
+
+    def run(self):
+        for groups in self.placements():
+            for turn in (RED, BLUE):
+                self.solve(groups, turn)
+        return bytes(self.values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve every small endgame and write the tablebase.")
+    parser.add_argument('--material', nargs='*', help="materials to solve, e.g. mm-m, instead of all of them")
+    parser.add_argument('--output', default=AI_TABLEBASE, help="tablebase file to write")
+    args = parser.parse_args()
+
+    names = args.material or materials()
+    for name in names:
+        if 'n' in name:
+            parser.error(f"{name}: knight materials are not solved, their moves are left out")
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 4 * ROWS * Tablebase.PIECES + 100))
+    tables = {}
+    for name in names:
+        start = time.perf_counter()
+        table = MaterialSolver(name).run()
+        tables[name] = table
+        counts = [sum(1 for value in table if value >> 6 == result)
+                  for result in (Tablebase.WIN, Tablebase.LOSS, Tablebase.DRAW)]
+        print(f"{name}: {counts[0]} wins, {counts[1]} losses, {counts[2]} draws for the player to move, "
+              f"{time.perf_counter() - start:.0f}s")
+
+    Tablebase.write(args.output, tables)
+    print(f"wrote {len(tables)} tables to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
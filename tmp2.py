@@ -3,9 +3,6 @@ import sys
 import time
 import copy
 
-# Initialize Pygame
-pygame.init()
-
 # Screen dimensions
 BOARD_WIDTH, BOARD_HEIGHT = 700, 700
 PANEL_WIDTH = 400
@@ -27,10 +24,6 @@ HIGHLIGHT = (173, 216, 230)  # Light blue for highlighting valid cells
 LIGHT_RED = (255, 182, 193)
 LIGHT_BLUE = (173, 216, 230)
 
-# Screen setup
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption('12x12 Checkers Game')
-
 
 class Piece:
     PADDING = 15
@@ -747,6 +740,10 @@ def place_enemy_knight(board):
 
 # Main game loop
 def main():
+    # Initialize Pygame and open the window here rather than on import
+    pygame.init()
+    win = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption('12x12 Checkers Game')
     run = True
     clock = pygame.time.Clock()
     board = Board()
@@ -798,8 +795,8 @@ def main():
                     board.placing_box = True
 
         # Draw the board and update the display
-        board.draw(WIN)
-        action_button = board.draw_panel(WIN)
+        board.draw(win)
+        action_button = board.draw_panel(win)
         pygame.display.update()
 
     pygame.quit()
@@ -3,9 +3,6 @@ import sys
 import time
 import copy
 
-# Initialize Pygame
-pygame.init()
-
 # Screen dimensions
 BOARD_WIDTH, BOARD_HEIGHT = 700, 700
 PANEL_WIDTH = 400
@@ -27,10 +24,6 @@ HIGHLIGHT = (173, 216, 230)  # Light blue for highlighting valid cells
 LIGHT_RED = (255, 182, 193)
 LIGHT_BLUE = (173, 216, 230)
 
-# Screen setup
-WIN = pygame.display.set_mode((WIDTH, HEIGHT))
-pygame.display.set_caption('12x12 Checkers Game')
-
 
 class Piece:
     PADDING = 15
@@ -660,6 +653,10 @@ def place_enemy_knight(board):
 
 
 def main():
+    # Initialize Pygame and open the window here rather than on import
+    pygame.init()
+    win = pygame.display.set_mode((WIDTH, HEIGHT))
+    pygame.display.set_caption('12x12 Checkers Game')
     run = True
     clock = pygame.time.Clock()
     board = Board()
@@ -705,8 +702,8 @@ def main():
                 elif action_button and action_button.collidepoint(pos) and not board.winner:
                     board.placing_box = True
 
-        board.draw(WIN)
-        action_button = board.draw_panel(WIN)
+        board.draw(win)
+        action_button = board.draw_panel(win)
         pygame.display.update()
 
     pygame.quit()